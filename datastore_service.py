@@ -1,9 +1,48 @@
+import asyncio
+import copy
+import grpc
 import os
 import pandas as pd
 from google.cloud import datastore
-from typing import Dict, List, Any, Optional
+from google.cloud.datastore import helpers
+from google.cloud.datastore_v1.services.datastore.async_client import DatastoreAsyncClient
+from google.cloud.datastore_v1.services.datastore.transports.grpc_asyncio import DatastoreGrpcAsyncIOTransport
+from google.cloud.datastore_v1.types import datastore as datastore_pb
+from google.cloud.datastore_v1.types import query as query_pb
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 from datetime import datetime
 import logging
+import threading
+from cachetools import TTLCache
+
+# Clients Datastore partagés par projet : un seul canal gRPC par processus
+_datastore_clients: Dict[str, datastore.Client] = {}
+_clients_lock = threading.Lock()
+
+# Types inférés (pd.api.types.infer_dtype) d'une colonne objet qui ne peut contenir aucune date
+NON_DATETIME_INFERRED_TYPES = frozenset({'empty', 'string', 'bytes', 'boolean', 'integer', 'floating', 'decimal'})
+
+def get_datastore_client(project_id: str) -> datastore.Client:
+    """
+    Retourne le client Datastore du projet, créé au premier appel puis réutilisé
+    """
+    with _clients_lock:
+        client = _datastore_clients.get(project_id)
+        if client is None:
+            client = datastore.Client(project=project_id)
+            _datastore_clients[project_id] = client
+        return client
+
+def _require_no_running_loop(message: str) -> None:
+    """
+    asyncio.run échoue dans une boucle d'événements déjà active (Jupyter, appelant
+    asynchrone) : lève RuntimeError avec message au lieu de l'erreur générique
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    raise RuntimeError(message)
 
 class DatastoreUserService:
     def __init__(self, project_id: Optional[str] = None):
@@ -14,6 +53,23 @@ class DatastoreUserService:
         self.client = None
         self.logger = logging.getLogger(__name__)
         
+        # Tailles des pages (première page, plafond) et nombre maximal de RPC simultanés
+        self.initial_page_size = 128
+        self.page_size = 2000
+        self.max_concurrency = 64
+        
+        # Intervalle (en entités) entre deux messages de progression des extractions
+        self.progress_log_interval = 10000
+        
+        # Lectures en cohérence à terme pour les extractions et comptages en masse :
+        # latence par RPC plus faible, au prix de ne pas voir les écritures toutes récentes
+        self.eventual_reads = True
+        
+        # Cache TTL des échantillons et comptages (un RPC chacun), partagé entre threads
+        self._sample_cache = TTLCache(maxsize=256, ttl=300)
+        self._count_cache = TTLCache(maxsize=256, ttl=300)
+        self._cache_lock = threading.Lock()
+        
         if not self.project_id:
             raise ValueError("Project ID must be provided or set in FIREBASE_PROJECT_ID environment variable")
     
@@ -22,13 +78,9 @@ class DatastoreUserService:
         Établit la connexion au Datastore
         """
         try:
-            # Initialiser le client Datastore
-            self.client = datastore.Client(project=self.project_id)
-            
-            # Test de connexion simple
-            query = self.client.query()
-            query.keys_only()
-            list(query.fetch(limit=1))
+            # Client partagé par le processus ; le canal gRPC est ouvert paresseusement
+            # au premier appel, les erreurs de connexion remontent donc à la première requête
+            self.client = get_datastore_client(self.project_id)
             
             self.logger.info(f"✅ Connected to Datastore project: {self.project_id}")
             return True
@@ -46,28 +98,15 @@ class DatastoreUserService:
                 if not self.connect():
                     return []
             
-            # Note: Datastore ne fournit pas d'API directe pour lister les kinds
-            # Cette méthode essaie quelques noms communs
-            common_kinds = [
-                'User', 'Users', 'user', 'users', 
-                'Person', 'Account', 'Profile', 'Member',
-                'UserProfile', 'Customer', 'Client'
+            # Métarequête sur le kind réservé __kind__ : un seul RPC pour tous les kinds
+            query = self.client.query(kind='__kind__')
+            query.keys_only()
+            found_kinds = [
+                entity.key.id_or_name for entity in query.fetch()
+                if not str(entity.key.id_or_name).startswith('__')
             ]
-            found_kinds = []
-            
-            print("🔍 Searching for available kinds...")
-            for kind in common_kinds:
-                try:
-                    query = self.client.query(kind=kind)
-                    query.keys_only()
-                    entities = list(query.fetch(limit=1))
-                    if entities:
-                        found_kinds.append(kind)
-                        print(f"✅ Found kind: '{kind}' with data")
-                except Exception as e:
-                    print(f"❌ Kind '{kind}' not found or error: {e}")
-                    continue
             
+            print(f"🔍 Found {len(found_kinds)} kinds: {found_kinds}")
             return found_kinds
             
         except Exception as e:
@@ -83,28 +122,218 @@ class DatastoreUserService:
                 if not self.connect():
                     return {}
             
+            # Échantillon déjà récupéré récemment : pas de nouveau RPC. Copie profonde : les
+            # valeurs imbriquées (listes, entités) du cache ne sont jamais partagées avec l'appelant
+            cache_key = (kind_name, limit)
+            with self._cache_lock:
+                cached_sample = self._sample_cache.get(cache_key)
+            if cached_sample is not None:
+                return copy.deepcopy(cached_sample)
+            
             query = self.client.query(kind=kind_name)
             entities = list(query.fetch(limit=limit))
             
+            sample = {}
             if entities:
                 sample = dict(entities[0])
-                if hasattr(entities[0], 'key') and entities[0].key:
+                key = entities[0].key
+                if key is not None:
                     sample['_key_info'] = {
-                        'kind': entities[0].key.kind,
-                        'id': entities[0].key.id,
-                        'name': entities[0].key.name
+                        'kind': key.kind,
+                        'id': key.id,
+                        'name': key.name
                     }
-                return sample
-            else:
-                return {}
+            
+            with self._cache_lock:
+                self._sample_cache[cache_key] = sample
+            return copy.deepcopy(sample)
                 
         except Exception as e:
             self.logger.error(f"❌ Error getting sample entity: {e}")
             return {}
     
-    def get_all_users_raw(self, kind_name: str = 'User') -> pd.DataFrame:
+    def get_users_by_ids(self, kind_name: str, ids: List[Any]) -> List[Dict[str, Any]]:
+        """
+        Récupère plusieurs entités par clé en lots via get_multi (un RPC par lot)
+        
+        ids: objets Key, ou identifiants tels que renvoyés par les extractions (nom de clé,
+        ou id numérique sous forme de chaîne de chiffres, reconverti en entier). Les clés
+        absentes du Datastore sont comptées dans le journal
+        """
+        try:
+            if not self.client:
+                if not self.connect():
+                    return []
+            
+            users = []
+            missing_count = 0
+            # Datastore limite une requête Lookup à 1000 clés
+            batch_size = 1000
+            for start in range(0, len(ids), batch_size):
+                keys = [self._entity_key(kind_name, entity_id) for entity_id in ids[start:start + batch_size]]
+                missing = []
+                for entity in self.client.get_multi(keys, missing=missing):
+                    user_data = dict(entity)
+                    user_data['id'] = entity.key.name or str(entity.key.id)
+                    users.append(user_data)
+                missing_count += len(missing)
+            
+            if missing_count:
+                self.logger.warning(f"⚠️  {missing_count}/{len(ids)} {kind_name} entities not found")
+            return users
+            
+        except Exception as e:
+            self.logger.error(f"❌ Error fetching entities by ids: {e}")
+            return []
+    
+    def _entity_key(self, kind_name: str, entity_id: Any) -> datastore.Key:
+        """
+        Clé d'un identifiant : un id numérique rendu en chaîne par _entity_ids redevient entier
+        """
+        if isinstance(entity_id, datastore.Key):
+            return entity_id
+        if isinstance(entity_id, str) and entity_id.isdigit():
+            entity_id = int(entity_id)
+        return self.client.key(kind_name, entity_id)
+    
+    def _entity_ids(self, entities: List[Any], start: int) -> List[str]:
+        """
+        Identifiants d'une page d'entités : nom ou id de clé, sinon position dans l'extraction
+        """
+        # Entity.key existe toujours, mais peut valoir None
+        return [
+            (key.name or (str(key.id) if key.id else f"auto_{i}")) if key is not None else f"unknown_{i}"
+            for i, key in enumerate((entity.key for entity in entities), start)
+        ]
+    
+    def _append_entities(self, columns: Dict[str, List[Any]], entities: List[Any], row_count: int,
+                         row_number: Optional[int] = None) -> int:
+        """
+        Ajoute une page d'entités aux colonnes accumulées et retourne le nouveau nombre de lignes
+        
+        row_count = lignes déjà présentes dans columns, row_number = position de la première
+        entité dans l'extraction (row_count par défaut)
+        """
+        ids = self._entity_ids(entities, row_count if row_number is None else row_number)
+        
+        if 'id' not in columns:
+            columns['id'] = [None] * row_count
+        
+        for entity, entity_id in zip(entities, ids):
+            # Propriété jamais vue : nouvelle colonne complétée par None pour les lignes précédentes.
+            # L'entité est déjà un dict : on la lit directement, sans copie intermédiaire
+            for key in entity:
+                if key not in columns:
+                    columns[key] = [None] * row_count
+            
+            for key, values in columns.items():
+                values.append(entity.get(key))
+            
+            # La clé Datastore prime sur une éventuelle propriété 'id'
+            columns['id'][-1] = entity_id
+            row_count += 1
+        
+        return row_count
+    
+    def _columns_to_dataframe(self, columns: Dict[str, List[Any]],
+                              schema: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """
+        Construit le DataFrame à partir des colonnes accumulées
+        """
+        schema = schema or {}
+        if schema:
+            columns = {
+                col: pd.Series(values, dtype=schema[col]) if col in schema else values
+                for col, values in columns.items()
+            }
+        df = pd.DataFrame(columns, copy=False)
+        
+        # Convertir les dates Datastore en chaînes ISO (même texte que datetime.isoformat()),
+        # une colonne à la fois
+        for col in df.columns:
+            if col in schema:
+                continue
+            series = df[col]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                df[col] = self._isoformat_datetime_column(series)
+            elif series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in NON_DATETIME_INFERRED_TYPES:
+                # Dates hors plage datetime64 (ex: an 9999) ou mêlées à d'autres types : seules les
+                # cellules datetime sont converties
+                is_datetime = series.map(lambda value: isinstance(value, datetime)).to_numpy(dtype=bool)
+                if is_datetime.any():
+                    values = series.to_numpy(dtype=object, copy=True)
+                    values[is_datetime] = [value.isoformat() for value in values[is_datetime]]
+                    df[col] = values
+        
+        return df
+    
+    def _isoformat_datetime_column(self, series: pd.Series) -> pd.Series:
+        """
+        Équivalent vectorisé de datetime.isoformat() sur une colonne datetime64 (NaT -> None)
+        
+        Microsecondes seulement si non nulles, fuseau au format +HH:MM
+        """
+        text = series.dt.strftime('%Y-%m-%dT%H:%M:%S')
+        microseconds = series.dt.microsecond
+        text = text.where(microseconds == 0, text + '.' + microseconds.astype('Int64').astype(str).str.zfill(6))
+        if series.dt.tz is not None:
+            offset = series.dt.strftime('%z')
+            text = text + offset.str[:3] + ':' + offset.str[3:]
+        return text.astype(object).where(series.notna(), None)
+    
+    def _build_query(self, kind_name: str, fields: Optional[List[str]] = None,
+                     keys_only: bool = False):
+        """
+        Construit la requête d'extraction d'un kind (projection ou clés seules en option)
+        """
+        query = self.client.query(kind=kind_name)
+        if keys_only:
+            query.keys_only()
+        elif fields:
+            # Projection : seules les propriétés demandées transitent sur le réseau
+            query.projection = fields
+        return query
+    
+    def _iter_entity_pages(self, query) -> Iterator[List[Any]]:
+        """
+        Parcourt une requête page par page avec curseur, pour éviter les timeouts
+        
+        Petite première page (réponse rapide pour les petits kinds), puis taille
+        doublée à chaque page jusqu'au plafond self.page_size
+        """
+        page_size = min(self.initial_page_size, self.page_size)
+        cursor = None
+        
+        while True:
+            query_iter = query.fetch(limit=page_size, start_cursor=cursor, eventual=self.eventual_reads)
+            
+            # Consommer tous les lots renvoyés pour cette requête avant de relancer
+            entities = [entity for page in query_iter.pages for entity in page]
+            if not entities:
+                return
+            
+            yield entities
+            
+            # Obtenir le curseur pour la page suivante
+            cursor = query_iter.next_page_token
+            if not cursor or len(entities) < page_size:
+                return
+            page_size = min(page_size * 2, self.page_size)
+    
+    def get_all_users_raw(self, kind_name: str = 'User', schema: Optional[Dict[str, str]] = None,
+                          fields: Optional[List[str]] = None, keys_only: bool = False) -> pd.DataFrame:
         """
         Récupère tous les utilisateurs depuis Datastore
+        
+        schema: types pandas optionnels par colonne (ex: {'email': 'string'}),
+        appliqués à la construction pour éviter l'inférence de type
+        fields: requête de projection limitée à ces propriétés (elles doivent être indexées ;
+        une propriété multi-valuée produit une ligne par valeur)
+        keys_only: ne récupérer que les clés (colonne 'id' uniquement)
+        
+        Avec eventual_reads (par défaut), les pages sont lues en cohérence à terme : plus rapide,
+        mais les écritures des dernières secondes peuvent manquer. Passer eventual_reads à False
+        si l'extraction doit refléter un état strictement à jour
         """
         try:
             if not self.client:
@@ -113,58 +342,25 @@ class DatastoreUserService:
             
             print(f"🔍 Fetching all entities of kind: '{kind_name}'")
             
-            # Créer une requête pour récupérer tous les utilisateurs
-            query = self.client.query(kind=kind_name)
+            query = self._build_query(kind_name, fields, keys_only)
             
-            users_data = []
+            # Accumulation colonne par colonne : évite une liste de dicts recopiée par pandas
+            columns: Dict[str, List[Any]] = {}
+            row_count = 0
+            next_progress = self.progress_log_interval
+            log_progress = self.logger.isEnabledFor(logging.INFO)
             
-            # Récupérer toutes les entités avec pagination pour éviter les timeouts
-            page_size = 1000
-            cursor = None
-            total_fetched = 0
+            for entities in self._iter_entity_pages(query):
+                row_count = self._append_entities(columns, entities, row_count)
+                # Progression limitée à un message par intervalle, formatée paresseusement
+                if log_progress and row_count >= next_progress:
+                    self.logger.info("Fetched %d entities of kind %s", row_count, kind_name)
+                    next_progress = row_count + self.progress_log_interval
             
-            while True:
-                query_iter = query.fetch(limit=page_size, start_cursor=cursor)
-                page = next(query_iter.pages)
-                entities = list(page)
-                
-                if not entities:
-                    break
-                
-                total_fetched += len(entities)
-                print(f"📥 Fetched {total_fetched} entities so far...")
-                
-                for entity in entities:
-                    # Convertir l'entité Datastore en dictionnaire
-                    user_data = dict(entity)
-                    
-                    # Ajouter l'ID de l'entité
-                    if hasattr(entity, 'key') and entity.key:
-                        if entity.key.name:
-                            user_data['id'] = entity.key.name
-                        elif entity.key.id:
-                            user_data['id'] = str(entity.key.id)
-                        else:
-                            user_data['id'] = f"auto_{len(users_data)}"
-                    else:
-                        user_data['id'] = f"unknown_{len(users_data)}"
-                    
-                    # Convertir les dates Datastore en timestamps
-                    for key, value in user_data.items():
-                        if isinstance(value, datetime):
-                            user_data[key] = value.isoformat()
-                    
-                    users_data.append(user_data)
-                
-                # Obtenir le curseur pour la page suivante
-                cursor = query_iter.next_page_token
-                if not cursor:
-                    break
+            print(f"📥 Total entities retrieved: {row_count}")
             
-            print(f"📥 Total entities retrieved: {len(users_data)}")
-            
-            if users_data:
-                df = pd.DataFrame(users_data)
+            if row_count:
+                df = self._columns_to_dataframe(columns, schema)
                 print(f"✅ Created DataFrame with {len(df)} rows and {len(df.columns)} columns")
                 print(f"Columns: {df.columns.tolist()}")
                 return df
@@ -177,66 +373,239 @@ class DatastoreUserService:
             print(f"❌ Error details: {e}")
             return pd.DataFrame()
     
+    def iter_users_batches(self, kind_name: str = 'User', batch_size: int = 50_000,
+                           schema: Optional[Dict[str, str]] = None,
+                           fields: Optional[List[str]] = None,
+                           keys_only: bool = False) -> Iterator[pd.DataFrame]:
+        """
+        Parcourt un kind par DataFrames de batch_size lignes au plus
+        
+        Contrairement à get_all_users_raw, le kind n'est jamais matérialisé en entier :
+        la mémoire reste proportionnelle à un lot (voir PostgreSQLLoaderService.load_users_batches)
+        """
+        if not self.client:
+            if not self.connect():
+                return
+        
+        query = self._build_query(kind_name, fields, keys_only)
+        
+        columns: Dict[str, List[Any]] = {}
+        batch_rows = 0
+        total_rows = 0
+        
+        try:
+            for entities in self._iter_entity_pages(query):
+                start = 0
+                while start < len(entities):
+                    # Découper la page à la frontière du lot courant
+                    chunk = entities[start:start + batch_size - batch_rows]
+                    start += len(chunk)
+                    
+                    # Position globale pour les identifiants de repli : uniques entre les lots
+                    batch_rows = self._append_entities(columns, chunk, batch_rows, total_rows)
+                    total_rows += len(chunk)
+                    
+                    if batch_rows >= batch_size:
+                        yield self._columns_to_dataframe(columns, schema)
+                        columns = {}
+                        batch_rows = 0
+            
+            if batch_rows:
+                yield self._columns_to_dataframe(columns, schema)
+            
+            print(f"📥 Total entities retrieved in batches: {total_rows}")
+        
+        except Exception as e:
+            # Un lot manquant fausserait silencieusement le chargement : on propage
+            print(f"❌ Error streaming '{kind_name}' from Datastore: {e}")
+            raise
+    
+    def _async_client(self) -> DatastoreAsyncClient:
+        """
+        Client gRPC asynchrone configuré comme self.client : mêmes identifiants et options
+        client, ou canal non sécurisé vers l'émulateur (DATASTORE_EMULATOR_HOST)
+        """
+        if not self.client and not self.connect():
+            raise RuntimeError(f"Could not connect to Datastore project: {self.project_id}")
+        
+        emulator_host = getattr(self.client, '_emulator_host', None)
+        if emulator_host:
+            channel = grpc.aio.insecure_channel(emulator_host.split('://')[-1])
+            return DatastoreAsyncClient(transport=DatastoreGrpcAsyncIOTransport(channel=channel))
+        return DatastoreAsyncClient(credentials=self.client._credentials,
+                                    client_options=self.client._client_options)
+    
+    async def get_all_users_raw_async(self, kind_name: str = 'User',
+                                      schema: Optional[Dict[str, str]] = None,
+                                      client: Optional[DatastoreAsyncClient] = None,
+                                      semaphore: Optional[asyncio.Semaphore] = None) -> pd.DataFrame:
+        """
+        Récupère toutes les entités d'un kind via le client gRPC asynchrone
+        
+        client / semaphore peuvent être partagés entre plusieurs appels concurrents ;
+        ils sont créés à la volée sinon (ils sont liés à la boucle d'événements courante)
+        """
+        client = client or self._async_client()
+        semaphore = semaphore or asyncio.Semaphore(self.max_concurrency)
+        
+        query = query_pb.Query(
+            kind=[query_pb.KindExpression(name=kind_name)],
+            limit=self.page_size
+        )
+        
+        read_options = datastore_pb.ReadOptions(
+            read_consistency=datastore_pb.ReadOptions.ReadConsistency.EVENTUAL
+            if self.eventual_reads else datastore_pb.ReadOptions.ReadConsistency.STRONG
+        )
+        
+        columns: Dict[str, List[Any]] = {}
+        row_count = 0
+        
+        while True:
+            request = datastore_pb.RunQueryRequest(project_id=self.project_id, query=query,
+                                                   read_options=read_options)
+            async with semaphore:
+                response = await client.run_query(request=request)
+            
+            batch = response.batch
+            row_count = self._append_entities(
+                columns,
+                [helpers.entity_from_protobuf(result.entity) for result in batch.entity_results],
+                row_count
+            )
+            
+            # Un lot vide n'est pas la fin (lot interrompu côté serveur) : seul NO_MORE_RESULTS
+            # termine, ou une limite/un curseur atteint sans que le curseur n'avance
+            more_results = batch.more_results
+            if more_results == query_pb.QueryResultBatch.MoreResultsType.NO_MORE_RESULTS:
+                break
+            if more_results in (query_pb.QueryResultBatch.MoreResultsType.MORE_RESULTS_AFTER_LIMIT,
+                                query_pb.QueryResultBatch.MoreResultsType.MORE_RESULTS_AFTER_CURSOR) \
+                    and batch.end_cursor == query.start_cursor:
+                break
+            query.start_cursor = batch.end_cursor
+        
+        self.logger.info(f"📥 Retrieved {row_count} entities of kind '{kind_name}' (async)")
+        return self._columns_to_dataframe(columns, schema) if row_count else pd.DataFrame()
+    
+    async def get_kinds_raw_async(self, kind_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Récupère plusieurs kinds en parallèle, avec une concurrence limitée par sémaphore
+        """
+        client = self._async_client()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        frames = await asyncio.gather(*[
+            self.get_all_users_raw_async(kind_name, client=client, semaphore=semaphore)
+            for kind_name in kind_names
+        ])
+        return dict(zip(kind_names, frames))
+    
+    def get_kinds_raw(self, kind_names: List[str]) -> Dict[str, pd.DataFrame]:
+        """
+        Version synchrone de get_kinds_raw_async pour les appelants existants
+        
+        Lève RuntimeError dans une boucle d'événements active : attendre get_kinds_raw_async
+        """
+        _require_no_running_loop("get_kinds_raw() cannot run inside a running event loop; "
+                                 "await get_kinds_raw_async() instead")
+        try:
+            return asyncio.run(self.get_kinds_raw_async(kind_names))
+        except Exception as e:
+            self.logger.error(f"❌ Error fetching kinds from Datastore: {e}")
+            return {}
+    
     def count_entities(self, kind_name: str) -> int:
         """
         Compte le nombre d'entités d'un kind donné
+        
+        Avec eventual_reads, le comptage peut omettre les écritures des dernières secondes
         """
         try:
             if not self.client:
                 if not self.connect():
                     return 0
             
-            # Utiliser une requête keys_only pour compter
+            with self._cache_lock:
+                cached_count = self._count_cache.get(kind_name)
+            if cached_count is not None:
+                return cached_count
+            
             query = self.client.query(kind=kind_name)
-            query.keys_only()
             
-            # Compter en parcourant (pas d'API count directe)
-            count = 0
-            for _ in query.fetch():
-                count += 1
+            # Agrégation COUNT(*) côté serveur : un seul RPC quel que soit le volume
+            try:
+                aggregation_query = self.client.aggregation_query(query).count(alias='total')
+                count = 0
+                for results in aggregation_query.fetch(eventual=self.eventual_reads):
+                    for aggregation in results:
+                        count = int(aggregation.value)
+            except Exception as e:
+                # Anciens émulateurs sans support des agrégations : parcours keys_only
+                self.logger.warning(f"⚠️  Aggregation count unavailable for '{kind_name}', falling back to key scan: {e}")
+                query.keys_only()
+                count = sum(1 for _ in query.fetch(eventual=self.eventual_reads))
             
+            with self._cache_lock:
+                self._count_cache[kind_name] = count
             return count
             
         except Exception as e:
             self.logger.error(f"❌ Error counting entities: {e}")
             return 0
     
+    async def _probe_kind(self, kind: str) -> Tuple[str, int, Dict[str, Any]]:
+        """
+        Compte les entités d'un kind et récupère un échantillon en parallèle
+        """
+        # Le client Datastore est synchrone : on délègue les appels au pool de threads
+        loop = asyncio.get_running_loop()
+        count, sample = await asyncio.gather(
+            loop.run_in_executor(None, self.count_entities, kind),
+            loop.run_in_executor(None, self.get_sample_entity, kind)
+        )
+        return kind, count, sample
+    
+    async def _explore_kinds_async(self, kinds: List[str]) -> List[Any]:
+        """
+        Sonde tous les kinds de manière concurrente
+        """
+        return await asyncio.gather(
+            *[self._probe_kind(kind) for kind in kinds],
+            return_exceptions=True
+        )
+    
     def explore_datastore(self) -> Dict[str, Any]:
         """
         Explore le Datastore pour trouver les données utilisateur
+        
+        Lève RuntimeError dans une boucle d'événements active (appeler depuis un thread)
         """
+        _require_no_running_loop("explore_datastore() cannot run inside a running event loop; "
+                                 "call it from a worker thread (e.g. asyncio.to_thread)")
         try:
             print("🔍 Exploring Datastore structure...")
             
-            # Essayer de lister quelques kinds communs avec des variations
-            exploration_kinds = [
-                'User', 'Users', 'user', 'users',
-                'Person', 'People', 'person', 'people',
-                'Account', 'Accounts', 'account', 'accounts',
-                'Profile', 'Profiles', 'profile', 'profiles',
-                'Member', 'Members', 'member', 'members',
-                'Customer', 'Customers', 'customer', 'customers',
-                'Client', 'Clients', 'client', 'clients',
-                'UserProfile', 'UserProfiles',
-                'UserAccount', 'UserAccounts'
-            ]
+            # Lister les kinds réellement présents au lieu de deviner leurs noms
+            exploration_kinds = self.list_kinds()
             
             found_data = {}
             
-            for kind in exploration_kinds:
-                try:
-                    count = self.count_entities(kind)
-                    if count > 0:
-                        sample = self.get_sample_entity(kind)
-                        found_data[kind] = {
-                            'count': count,
-                            'sample_fields': list(sample.keys()) if sample else []
-                        }
-                        print(f"✅ Found '{kind}': {count} entities")
-                        if sample:
-                            print(f"   Sample fields: {list(sample.keys())[:10]}")
-                except Exception as e:
+            # Sonder tous les kinds en parallèle : le temps total suit le RPC le plus lent
+            results = asyncio.run(self._explore_kinds_async(exploration_kinds))
+            
+            for result in results:
+                if isinstance(result, Exception):
                     continue
+                kind, count, sample = result
+                if count > 0:
+                    found_data[kind] = {
+                        'count': count,
+                        'sample_fields': list(sample.keys()) if sample else []
+                    }
+                    print(f"✅ Found '{kind}': {count} entities")
+                    if sample:
+                        print(f"   Sample fields: {list(sample.keys())[:10]}")
             
             return found_data
             
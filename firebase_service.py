@@ -3,61 +3,389 @@ from firebase_admin import credentials
 from firebase_admin import db
 from firebase_admin import auth
 import pandas as pd
+import numpy as np
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import json
+import logging
+import itertools
+import shelve
+import time
+import traceback
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+try:
+    # C JSON encoder, several times faster than the stdlib one for the raw export
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # Optional Arrow-backed DataFrame construction (USE_ARROW=1)
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Maximum number of identifiers accepted by a single auth.get_users call
+AUTH_LOOKUP_BATCH_SIZE = 100
+
+# Per-user diagnostics go through this logger (DEBUG in dev mode) rather than print
+logger = logging.getLogger(__name__)
+
+def _dump_json(value: Any, indent: bool) -> bytes:
+    """
+    Serialize value to UTF-8 JSON (2-space indent or compact), with orjson when available
+    """
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(value, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+# Characters of Firebase UIDs and push ids, in key order; '-' (push ids) sorts before them
+USER_KEY_ALPHABET = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+def _user_key_ranges(shards: int) -> List[Tuple[Optional[str], Optional[str]]]:
+    """
+    Split the /Users key space into contiguous [start, end) ranges by first character
+
+    The first and last ranges are open-ended, so every string key falls in exactly one
+    """
+    shards = max(1, min(shards, len(USER_KEY_ALPHABET)))
+    step = len(USER_KEY_ALPHABET) / shards
+    boundaries = [USER_KEY_ALPHABET[round(i * step)] for i in range(1, shards)]
+    return list(zip([None] + boundaries, boundaries + [None]))
+
+def _email_from_provider_data(provider_data: Any) -> Optional[Tuple[str, str]]:
+    """
+    (email, provider) from an Auth providerData list mirrored in the RTDB user node
+
+    Assumes the Auth layout: [{'providerId': 'google.com', 'email': ...}, ...]. Returns
+    None unless an entry carries an email, so the Auth lookup is only skipped when it
+    could not have told us more
+    """
+    if not isinstance(provider_data, list):
+        return None
+    entries = [entry for entry in provider_data if isinstance(entry, dict)]
+    email = next((entry['email'] for entry in entries if entry.get('email')), None)
+    if not email:
+        return None
+    provider = 'google.com' if any(entry.get('providerId') == 'google.com' for entry in entries) else 'CREDENTIALS'
+    return email, provider
+
+# Closed value sets of the derived columns, stored as categoricals (int8 codes)
+PROVIDER_CATEGORIES = ['CREDENTIALS', 'google.com']
+AUTH_SOURCE_CATEGORIES = ['database', 'auth', 'none']
+
+@dataclass(frozen=True)
+class FirebaseConfig:
+    """
+    Service configuration, read from the environment once per process
+    """
+    key_path: str
+    database_url: str
+    mode: str
+    dev_user_limit: int
+    auth_lookup_concurrency: int
+    auth_cache_path: str
+    auth_cache_ttl: float
+    users_page_size: int
+    users_fetch_shards: int
+    use_arrow: bool
+
+    @classmethod
+    def from_env(cls) -> 'FirebaseConfig':
+        return cls(
+            # Path to your service account key file
+            key_path=os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY_PATH', './service-account.json'),
+            database_url=os.getenv('FIREBASE_DATABASE_URL', 'https://kastudio-6a436-default-rtdb.firebaseio.com/'),
+            mode=os.getenv('MODE', 'prod').lower(),
+            dev_user_limit=int(os.getenv('DEV_USER_LIMIT', '1000')),
+            # Number of auth.get_users batches in flight at once
+            auth_lookup_concurrency=int(os.getenv('AUTH_LOOKUP_CONCURRENCY', '16')),
+            # On-disk cache of Auth lookups, reused across runs (empty path disables it)
+            auth_cache_path=os.getenv('AUTH_CACHE_PATH', '.auth_cache'),
+            auth_cache_ttl=float(os.getenv('AUTH_CACHE_TTL_DAYS', '7')) * 86400,
+            # Number of /Users children fetched per Realtime Database query
+            users_page_size=int(os.getenv('USERS_PAGE_SIZE', '5000')),
+            # Key ranges of /Users fetched concurrently (1 = sequential paginated scan)
+            users_fetch_shards=int(os.getenv('USERS_FETCH_SHARDS', '1')),
+            # Build the users DataFrame through Arrow's C++ column builders
+            use_arrow=os.getenv('USE_ARROW', '0') == '1'
+        )
 
 class FirebaseUserService:
+    # Set by the first instantiation (after the application loaded its .env);
+    # later instances reuse it without re-reading the environment or re-initializing the SDK
+    _config: Optional[FirebaseConfig] = None
+
     def __init__(self):
         """
         Initialize Firebase Realtime Database client using service account
         """
         try:
-            # Initialize Firebase Admin SDK if not already initialized
-            if not firebase_admin._apps:
-                # Path to your service account key file
-                key_path = os.getenv('FIREBASE_SERVICE_ACCOUNT_KEY_PATH', './service-account.json')
-                database_url = os.getenv('FIREBASE_DATABASE_URL', 'https://kastudio-6a436-default-rtdb.firebaseio.com/')
-                
-                print(f"🔐 Using service account key: {key_path}")
-                print(f"🔗 Database URL: {database_url}")
-                
-                if not os.path.exists(key_path):
-                    raise FileNotFoundError(f"Service account key file not found: {key_path}")
-                
-                # Load credentials
-                cred = credentials.Certificate(key_path)
-                
-                # Initialize Firebase Admin with Realtime Database URL
-                firebase_admin.initialize_app(cred, {
-                    'databaseURL': database_url
-                })
-                
-                print("✓ Firebase Admin SDK initialized successfully")
+            config = FirebaseUserService._config
+            if config is None:
+                config = self._initialize(FirebaseConfig.from_env())
+                FirebaseUserService._config = config
+            
+            self.mode = config.mode
+            self.dev_user_limit = config.dev_user_limit
+            self.auth_lookup_concurrency = config.auth_lookup_concurrency
+            self.auth_cache_path = config.auth_cache_path
+            self.auth_cache_ttl = config.auth_cache_ttl
+            self.users_page_size = config.users_page_size
+            self.users_fetch_shards = config.users_fetch_shards
+            self.use_arrow = config.use_arrow and pa is not None
+            self._auth_cache = None
+            
+            # Last DataFrame returned by get_all_users_raw, reused by get_dataframe_info
+            self._cached_df = None
+            
+        except Exception as e:
+            print(f"❌ Error initializing Firebase Realtime Database: {e}")
+            raise
+
+    @staticmethod
+    def _initialize(config: FirebaseConfig) -> FirebaseConfig:
+        """
+        One-time process setup: Firebase Admin SDK app and logging
+        """
+        # Initialize Firebase Admin SDK if not already initialized
+        if not firebase_admin._apps:
+            print(f"🔐 Using service account key: {config.key_path}")
+            print(f"🔗 Database URL: {config.database_url}")
+            
+            if not os.path.exists(config.key_path):
+                raise FileNotFoundError(f"Service account key file not found: {config.key_path}")
+            
+            # Load credentials
+            cred = credentials.Certificate(config.key_path)
+            
+            # Initialize Firebase Admin with Realtime Database URL
+            firebase_admin.initialize_app(cred, {
+                'databaseURL': config.database_url
+            })
+            
+            print("✓ Firebase Admin SDK initialized successfully")
+        else:
+            print("✓ Firebase app already initialized")
+        
+        logger.setLevel(logging.DEBUG if config.mode == 'dev' else logging.INFO)
+        # No-op when the application already configured logging
+        logging.basicConfig(format='%(message)s')
+        
+        print(f"🔧 Running in {config.mode.upper()} mode")
+        if config.mode == 'dev':
+            print(f"📊 Development mode: limiting to {config.dev_user_limit} users")
+        
+        print("✓ Firebase Realtime Database client ready")
+        return config
+
+    def _iter_user_pages(self, limit: Optional[int] = None, page_size: Optional[int] = None,
+                         start_key: Optional[str] = None,
+                         end_key: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the /Users node in key order, one page (dict of uid -> data) at a time
+        
+        Realtime Database queries have no start_after: every page after the first
+        starts at the last key already yielded and drops it. limit caps the total
+        number of users yielded (e.g. DEV_USER_LIMIT); start_key (inclusive) and
+        end_key (exclusive) restrict the scan to a key range
+        """
+        page_size = page_size or self.users_page_size
+        last_key = None
+        remaining = limit
+        
+        while remaining is None or remaining > 0:
+            fetch_size = page_size if remaining is None else min(page_size, remaining)
+            query = db.reference('/Users').order_by_key()
+            if end_key is not None:
+                query = query.end_at(end_key)
+            
+            if last_key is None:
+                if start_key is not None:
+                    query = query.start_at(start_key)
+                users_page = query.limit_to_first(fetch_size).get() or {}
             else:
-                print("✓ Firebase app already initialized")
+                users_page = query.start_at(last_key).limit_to_first(fetch_size + 1).get() or {}
+                if users_page.pop(last_key, None) is None and len(users_page) > fetch_size:
+                    # Boundary key deleted meanwhile: the extra child belongs to the next page
+                    users_page.popitem()
             
-            # Get mode configuration
-            self.mode = os.getenv('MODE', 'prod').lower()
-            self.dev_user_limit = int(os.getenv('DEV_USER_LIMIT', '1000'))
+            # end_at is inclusive: the end key itself belongs to the next range
+            if end_key is not None and users_page.pop(end_key, None) is not None:
+                remaining = 0
             
-            print(f"🔧 Running in {self.mode.upper()} mode")
-            if self.mode == 'dev':
-                print(f"📊 Development mode: limiting to {self.dev_user_limit} users")
+            if not users_page:
+                return
             
-            print("✓ Firebase Realtime Database client ready")
+            yield users_page
             
-        except Exception as e:
-            print(f"❌ Error initializing Firebase Realtime Database: {e}")
-            raise
+            if len(users_page) < fetch_size:
+                return
+            if remaining is not None:
+                remaining -= len(users_page)
+            last_key = next(reversed(users_page))
+
+    def _iter_user_pages_sharded(self, shards: int) -> Iterator[Dict[str, Any]]:
+        """
+        Fetch /Users as shards key ranges scanned concurrently, yielded in key order
+        
+        Total latency becomes that of the slowest shard rather than the sum of all
+        pages, at the cost of holding the completed shards in memory until consumed
+        """
+        def fetch_range(key_range: Tuple[Optional[str], Optional[str]]) -> Dict[str, Any]:
+            start_key, end_key = key_range
+            shard_users = {}
+            for users_page in self._iter_user_pages(start_key=start_key, end_key=end_key):
+                shard_users.update(users_page)
+            return shard_users
+        
+        key_ranges = _user_key_ranges(shards)
+        with ThreadPoolExecutor(max_workers=len(key_ranges)) as executor:
+            for shard_users in executor.map(fetch_range, key_ranges):
+                if shard_users:
+                    yield shard_users
+
+    def _user_pages(self, limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        /Users pages: sharded parallel scan when USERS_FETCH_SHARDS > 1, paginated scan otherwise
+        """
+        if self.users_fetch_shards > 1 and limit is None:
+            return self._iter_user_pages_sharded(self.users_fetch_shards)
+        return self._iter_user_pages(limit=limit)
+
+    def _get_auth_cache(self) -> Optional[shelve.Shelf]:
+        """
+        Open the on-disk Auth cache on first use (None if disabled or unavailable)
+        """
+        if self._auth_cache is None and self.auth_cache_path:
+            try:
+                self._auth_cache = shelve.open(self.auth_cache_path)
+            except Exception as cache_error:
+                print(f"⚠️  Auth cache disabled, could not open {self.auth_cache_path}: {cache_error}")
+                self.auth_cache_path = None
+        return self._auth_cache
+
+    def close(self) -> None:
+        """
+        Close the on-disk Auth cache if it was opened (reopened on next use)
+        """
+        if self._auth_cache is not None:
+            self._auth_cache.close()
+            self._auth_cache = None
+
+    def __enter__(self) -> 'FirebaseUserService':
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.close()
+
+    def _fetch_auth_batch(self, chunk: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch one batch (at most 100 UIDs) of Firebase Auth records
+        
+        Returns {uid: {'email', 'email_verified', 'provider', 'cached_at'}}; UIDs unknown
+        to Auth get an entry without email. A failing batch is reported and yields
+        no entries, without affecting the others
+        """
+        try:
+            result = auth.get_users([auth.UidIdentifier(uid) for uid in chunk])
+        except Exception as auth_error:
+            print(f"⚠️  Could not retrieve auth info for {len(chunk)} users: {auth_error}")
+            return {}
+        
+        if result.not_found:
+            logger.debug("%d users not found in Auth", len(result.not_found))
+        
+        cached_at = time.time()
+        auth_records = {}
+        
+        for user_auth_record in result.users:
+            # UserRecord.provider_data is always present; stop at the first Google provider
+            provider = 'CREDENTIALS' if user_auth_record.email else 'google.com'
+            if user_auth_record.email and any(p.provider_id == 'google.com' for p in user_auth_record.provider_data):
+                provider = 'google.com'
+            
+            auth_records[user_auth_record.uid] = {
+                'email': user_auth_record.email,
+                'email_verified': user_auth_record.email_verified,
+                'provider': provider,
+                'cached_at': cached_at
+            }
+        
+        for identifier in result.not_found:
+            auth_records[identifier.uid] = {
+                'email': None,
+                'email_verified': False,
+                'provider': 'google.com',
+                'cached_at': cached_at
+            }
+        
+        return auth_records
+
+    def _fetch_auth_records(self, uids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch Firebase Auth records for the given UIDs, 100 per auth.get_users call
+        
+        Entries younger than AUTH_CACHE_TTL_DAYS are served from the on-disk cache;
+        the remaining batches are independent HTTPS round-trips issued concurrently
+        (AUTH_LOOKUP_CONCURRENCY threads). Returns a {uid: entry} dict (see
+        _fetch_auth_batch); UIDs whose batch failed are simply absent
+        """
+        auth_records = {}
+        auth_cache = self._get_auth_cache()
+        
+        if auth_cache is not None:
+            now = time.time()
+            missing_uids = []
+            for uid in uids:
+                entry = auth_cache.get(uid)
+                if entry is not None and now - entry['cached_at'] < self.auth_cache_ttl:
+                    auth_records[uid] = entry
+                else:
+                    missing_uids.append(uid)
+            if auth_records:
+                logger.debug("%d/%d Auth records served from cache", len(auth_records), len(uids))
+        else:
+            missing_uids = uids
+        
+        chunks = [missing_uids[start:start + AUTH_LOOKUP_BATCH_SIZE]
+                  for start in range(0, len(missing_uids), AUTH_LOOKUP_BATCH_SIZE)]
+        if not chunks:
+            return auth_records
+        
+        if len(chunks) == 1:
+            batches = [self._fetch_auth_batch(chunks[0])]
+        else:
+            max_workers = max(1, min(self.auth_lookup_concurrency, len(chunks)))
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                batches = list(executor.map(self._fetch_auth_batch, chunks))
+        
+        # The shelf is only written from this thread, once the batches are back
+        for batch in batches:
+            auth_records.update(batch)
+            if auth_cache is not None:
+                auth_cache.update(batch)
+        if auth_cache is not None:
+            auth_cache.sync()
+        
+        return auth_records
 
-    def _determine_provider_and_email(self, uid: str, user_info: Dict[str, Any]) -> Dict[str, Any]:
+    def _determine_provider_and_email(self, uid: str, user_info: Dict[str, Any],
+                                      auth_records: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Détermine le provider et l'email pour un utilisateur
         
         Logique:
         - Si email présent dans user_info ou Auth -> provider = 'CREDENTIALS'
         - Si pas d'email -> provider = 'google.com'
+        
+        auth_records: comptes Auth déjà récupérés en lot (voir _fetch_auth_records) ;
+        à défaut, le compte de cet utilisateur est récupéré seul
         """
         result = {
             'email': None,
@@ -67,46 +395,155 @@ class FirebaseUserService:
         
         # Check email in user_info first
         email_from_db = user_info.get('email')
+        # providerData mirrored in the database: only looked at without a database email
+        provider_email = None if email_from_db else _email_from_provider_data(
+            user_info.get('providerData') or user_info.get('provider_data'))
         
         if email_from_db:
             result['email'] = email_from_db
             result['provider'] = 'CREDENTIALS'
             result['email_verified'] = user_info.get('emailVerified', False)
-            if self.mode == 'dev':
-                print(f"📧 Email found in database for {uid}: {email_from_db}")
+            logger.debug("Email found in database for %s: %s", uid, email_from_db)
+        elif provider_email:
+            # No Auth call needed
+            result['email'], result['provider'] = provider_email
+            result['email_verified'] = user_info.get('emailVerified', False)
+            logger.debug("Email found in providerData for %s: %s", uid, result['email'])
         else:
             # Try to get email from Firebase Auth
-            try:
-                user_auth_record = auth.get_user(uid)
-                
-                if user_auth_record.email:
-                    result['email'] = user_auth_record.email
-                    result['provider'] = 'CREDENTIALS'
-                    result['email_verified'] = user_auth_record.email_verified
-                    if self.mode == 'dev':
-                        print(f"📧 Email retrieved from Auth for {uid}: {user_auth_record.email}")
-                    
-                    # Check if user has Google provider
-                    if hasattr(user_auth_record, 'provider_data'):
-                        google_providers = [p for p in user_auth_record.provider_data if p.provider_id == 'google.com']
-                        if google_providers:
-                            result['provider'] = 'google.com'
-                            if self.mode == 'dev':
-                                print(f"🔍 Google provider detected for {uid}")
-                            
-                else:
-                    # No email found, assume Google provider
-                    result['provider'] = 'google.com'
-                    if self.mode == 'dev':
-                        print(f"❌ No email found for {uid}, setting provider to google.com")
-                    
-            except Exception as auth_error:
-                if self.mode == 'dev':
-                    print(f"⚠️  Could not retrieve auth info for {uid}: {auth_error}")
-                # Keep default: no email, provider = google.com
+            if auth_records is None:
+                auth_records = self._fetch_auth_records([uid])
+            auth_entry = auth_records.get(uid)
+            
+            if auth_entry is not None and auth_entry['email']:
+                result['email'] = auth_entry['email']
+                result['email_verified'] = auth_entry['email_verified']
+                # 'google.com' si le compte a un provider Google, 'CREDENTIALS' sinon
+                result['provider'] = auth_entry['provider']
+                logger.debug("Email retrieved from Auth for %s: %s (%s)", uid, auth_entry['email'], auth_entry['provider'])
+                        
+            else:
+                # No email found (or no Auth record), assume Google provider
+                logger.debug("No email found for %s, setting provider to google.com", uid)
         
         return result
 
+    def _provider_fields(self, provider_info: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        User fields set from a _determine_provider_and_email result (email only when found)
+        """
+        fields = {
+            'provider': provider_info['provider'],
+            'emailVerified': provider_info['email_verified']
+        }
+        if provider_info['email']:
+            fields['email'] = provider_info['email']
+        return fields
+
+    def _append_user_row(self, columns: Dict[str, List[Any]], user_info: Dict[str, Any],
+                         derived: Dict[str, Any], row_count: int) -> None:
+        """
+        Append one user to the accumulated column lists (row_count = rows already present)
+        
+        Fields in derived override those of user_info; a field seen for the first time
+        gets a new column back-filled with None for the previous rows
+        """
+        for key in user_info:
+            if key not in columns:
+                columns[key] = [None] * row_count
+        for key in derived:
+            if key not in columns:
+                columns[key] = [None] * row_count
+        
+        for key, values in columns.items():
+            values.append(derived[key] if key in derived else user_info.get(key))
+
+    def _build_users_frame(self, columns: Dict[str, List[Any]]) -> pd.DataFrame:
+        """
+        DataFrame from the accumulated column lists, Arrow-backed when USE_ARROW=1
+        
+        With USE_ARROW=1 only the scalar string, boolean and integer fields get an Arrow
+        dtype. Dict and list fields (Arrow would merge their keys into one struct type),
+        all-null fields (written to later, e.g. email) and fields mixing types keep the
+        regular object dtype
+        """
+        if not self.use_arrow:
+            return pd.DataFrame(columns, copy=False)
+        
+        frame = {}
+        for name, values in columns.items():
+            try:
+                array = pa.array(values, from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                array = None
+            if array is not None and (pa.types.is_string(array.type) or pa.types.is_boolean(array.type)
+                                      or pa.types.is_integer(array.type)):
+                frame[name] = pd.arrays.ArrowExtensionArray(array)
+            else:
+                frame[name] = values
+        return pd.DataFrame(frame, copy=False)
+
+    def _derive_provider_columns(self, df: pd.DataFrame) -> None:
+        """
+        Add provider, emailVerified, hasEmail and authSource to a users DataFrame, in place
+        
+        Same rules as _determine_provider_and_email, as column operations: users with an
+        email in the database are CREDENTIALS; only the others go through the batched
+        Auth lookup, whose results are assigned back on that subset
+        """
+        if 'email' not in df.columns:
+            df['email'] = None
+        has_db_email = df['email'].notna() & (df['email'] != '')
+        
+        if 'emailVerified' in df.columns:
+            email_verified = df['emailVerified'].where(has_db_email & df['emailVerified'].notna(), False)
+        else:
+            email_verified = pd.Series(False, index=df.index, dtype=object)
+        
+        provider = pd.Series(np.where(has_db_email, 'CREDENTIALS', 'google.com'), index=df.index, dtype=object)
+        auth_source = pd.Series(np.where(has_db_email, 'database', 'none'), index=df.index, dtype=object)
+        has_email = has_db_email.copy()
+        
+        lookup_mask = ~has_db_email
+        
+        # A providerData list mirrored in the snapshot resolves some of them without any Auth call
+        provider_data_column = next((col for col in ('providerData', 'provider_data') if col in df.columns), None)
+        if provider_data_column is not None:
+            resolved = df.loc[lookup_mask, provider_data_column].map(_email_from_provider_data).dropna()
+            if len(resolved):
+                resolved_index = resolved.index
+                df.loc[resolved_index, 'email'] = [email for email, _ in resolved]
+                provider[resolved_index] = [user_provider for _, user_provider in resolved]
+                auth_source[resolved_index] = 'database'
+                if 'emailVerified' in df.columns:
+                    resolved_verified = df.loc[resolved_index, 'emailVerified']
+                    email_verified[resolved_index] = resolved_verified.where(resolved_verified.notna(), False).to_numpy()
+                has_email[resolved_index] = True
+                lookup_mask &= ~df.index.isin(resolved_index)
+        
+        # Remaining users without an email: one batched Auth lookup for the whole subset
+        auth_records = self._fetch_auth_records(df.loc[lookup_mask, 'uid'].tolist())
+        if auth_records:
+            auth_df = pd.DataFrame.from_dict(auth_records, orient='index')
+            auth_df = auth_df[auth_df['email'].notna() & (auth_df['email'] != '')]
+            
+            found = lookup_mask & df['uid'].isin(auth_df.index)
+            matched = auth_df.loc[df.loc[found, 'uid']]
+            
+            df.loc[found, 'email'] = matched['email'].to_numpy()
+            email_verified[found] = matched['email_verified'].to_numpy()
+            provider[found] = matched['provider'].to_numpy()
+            auth_source[found] = 'auth'
+            has_email |= found
+            
+            print(f"🔐 Retrieved {int(found.sum())}/{int(lookup_mask.sum())} emails from Auth for users without email")
+        
+        # Low-cardinality derived columns are stored as categoricals
+        df['provider'] = pd.Categorical(provider, categories=PROVIDER_CATEGORIES)
+        df['emailVerified'] = email_verified
+        df['hasEmail'] = has_email
+        df['authSource'] = pd.Categorical(auth_source, categories=AUTH_SOURCE_CATEGORIES)
+
     def get_all_users_raw(self) -> pd.DataFrame:
         """
         Fetch all users from Firebase Realtime Database (/Users path)
@@ -117,83 +554,59 @@ class FirebaseUserService:
         try:
             print("🔍 Fetching users from Firebase Realtime Database...")
             
-            # Get reference to Users node (following your test.py example)
-            ref = db.reference('/Users')
-            users_data = ref.get()
-            
-            if not users_data:
-                print("❌ No users found in Firebase Realtime Database at /Users path")
-                return pd.DataFrame()
-            
-            total_users_in_db = len(users_data)
-            print(f"✓ Found {total_users_in_db} total users in database")
-            
             # Apply dev mode limitation
-            if self.mode == 'dev' and total_users_in_db > self.dev_user_limit:
-                print(f"🔧 Development mode: limiting to first {self.dev_user_limit} users")
-                # Get first N users (convert to list to get ordered subset)
-                users_items = list(users_data.items())[:self.dev_user_limit]
-                users_data = dict(users_items)
-                print(f"📊 Processing {len(users_data)} users (limited from {total_users_in_db})")
-            else:
-                print(f"📊 Processing all {len(users_data)} users")
+            limit = self.dev_user_limit if self.mode == 'dev' else None
+            if limit:
+                print(f"🔧 Development mode: limiting to first {limit} users")
             
-            # Convert to list of dictionaries for DataFrame
-            users_list = []
+            # Build the DataFrame column by column instead of from a list of per-user dict copies
+            columns: Dict[str, List[Any]] = {}
             processed_count = 0
+            fetched_count = 0
             
-            for uid, user_info in users_data.items():
-                if isinstance(user_info, dict):
-                    # Create a copy of user data
-                    user_record = user_info.copy()
-                    
-                    # Add the UID as 'id' field
-                    user_record['id'] = uid
-                    user_record['uid'] = uid  # Keep original UID as well
-                    
-                    # Determine provider and email using the new logic
-                    provider_info = self._determine_provider_and_email(uid, user_info)
-                    
-                    # Update user record with provider information
-                    if provider_info['email']:
-                        user_record['email'] = provider_info['email']
-                    user_record['provider'] = provider_info['provider']
-                    user_record['emailVerified'] = provider_info['email_verified']
-                    
-                    # Add additional metadata
-                    user_record['hasEmail'] = provider_info['email'] is not None
-                    user_record['authSource'] = 'database' if user_info.get('email') else 'auth' if provider_info['email'] else 'none'
-                    
-                    users_list.append(user_record)
-                    processed_count += 1
-                    
-                    # Progress indicator for dev mode
-                    if self.mode == 'dev' and processed_count % 100 == 0:
-                        print(f"📝 Processed {processed_count}/{len(users_data)} users...")
-                    
-                else:
-                    # Handle case where user_info is not a dict
-                    if self.mode == 'dev':
-                        print(f"⚠️  Skipping user {uid}: data is not a dictionary")
-                    continue
+            # /Users is streamed page by page: only one page of raw snapshot is held at a time
+            for users_page in self._user_pages(limit=limit):
+                fetched_count += len(users_page)
+                
+                for uid, user_info in users_page.items():
+                    if isinstance(user_info, dict):
+                        # Add the UID as 'id' field, keep original UID as well
+                        self._append_user_row(columns, user_info, {'id': uid, 'uid': uid}, processed_count)
+                        processed_count += 1
+                        
+                    else:
+                        # Handle case where user_info is not a dict
+                        logger.debug("Skipping user %s: data is not a dictionary", uid)
+                        continue
+                
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("Processed %d users...", processed_count)
+            
+            if not fetched_count:
+                print("❌ No users found in Firebase Realtime Database at /Users path")
+                return pd.DataFrame()
             
-            if not users_list:
+            if not processed_count:
                 print("❌ No valid user records found")
                 return pd.DataFrame()
             
-            # Convert to DataFrame
-            df = pd.DataFrame(users_list)
+            # Convert to DataFrame (dict of lists: no per-row schema inference)
+            df = self._build_users_frame(columns)
             
-            # Summary statistics
+            # Determine provider and email for all users at once
+            self._derive_provider_columns(df)
+            
+            # Summary statistics: one bincount over the categorical codes gives every provider count
             total_users = len(df)
-            users_with_email = df['hasEmail'].sum()
+            users_with_email = int(np.count_nonzero(df['hasEmail'].to_numpy()))
             users_without_email = total_users - users_with_email
-            credentials_users = (df['provider'] == 'CREDENTIALS').sum()
-            google_users = (df['provider'] == 'google.com').sum()
+            provider_counts = np.bincount(df['provider'].cat.codes.to_numpy() + 1,
+                                          minlength=len(PROVIDER_CATEGORIES) + 1)[1:]
+            credentials_users, google_users = (int(count) for count in provider_counts)
             
             print(f"✅ Successfully fetched {total_users} users from Firebase")
-            if self.mode == 'dev' and total_users_in_db > self.dev_user_limit:
-                print(f"🔧 Limited from {total_users_in_db} total users (dev mode)")
+            if limit and fetched_count >= limit:
+                print(f"🔧 Limited to the first {limit} users (dev mode)")
             print(f"📊 Users with email: {users_with_email}")
             print(f"📊 Users without email: {users_without_email}")
             print(f"📊 CREDENTIALS provider: {credentials_users}")
@@ -209,44 +622,83 @@ class FirebaseUserService:
                 print(f"📝 Sample user structure: {list(sample_user.keys())}")
                 print(f"📝 Sample user provider: {sample_user.get('provider', 'N/A')}")
             
+            self._cached_df = df
             return df
             
         except Exception as e:
             print(f"❌ Error fetching users: {e}")
-            import traceback
             traceback.print_exc()
             return pd.DataFrame()
 
+    def iter_users_raw(self, page_size: Optional[int] = None) -> Iterator[pd.DataFrame]:
+        """
+        Stream users from /Users as DataFrames of at most page_size users
+        
+        Same rows and derived columns as get_all_users_raw, one page at a time, so the
+        caller can transform and load a page while the next one is fetched; only one
+        page is held in memory. In dev mode, stops after DEV_USER_LIMIT users
+        """
+        limit = self.dev_user_limit if self.mode == 'dev' else None
+        
+        for users_page in self._iter_user_pages(limit=limit, page_size=page_size):
+            columns: Dict[str, List[Any]] = {}
+            row_count = 0
+            
+            for uid, user_info in users_page.items():
+                if isinstance(user_info, dict):
+                    self._append_user_row(columns, user_info, {'id': uid, 'uid': uid}, row_count)
+                    row_count += 1
+                else:
+                    logger.debug("Skipping user %s: data is not a dictionary", uid)
+            
+            if not row_count:
+                continue
+            
+            df = self._build_users_frame(columns)
+            self._derive_provider_columns(df)
+            yield df
+
+    def get_dataframe_info(self, df: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+        """
+        Describe a users DataFrame (shape, dtypes, null counts, memory)
+        
+        Uses df when given, else the last result of get_all_users_raw; users are
+        only fetched from Firebase when neither is available
+        """
+        if df is None:
+            df = self._cached_df if self._cached_df is not None else self.get_all_users_raw()
+        
+        return {
+            'shape': df.shape,
+            'columns': df.columns.tolist(),
+            'dtypes': df.dtypes.astype(str).to_dict(),
+            'null_counts': df.isna().sum().to_dict(),
+            'memory_usage_bytes': int(df.memory_usage(deep=True).sum())
+        }
+
     def get_user_by_id(self, user_id: str) -> Dict[str, Any]:
         """
         Fetch a specific user by ID from Firebase Realtime Database
         """
         try:
-            if self.mode == 'dev':
-                print(f"🔍 Fetching user: {user_id}")
+            logger.debug("Fetching user: %s", user_id)
             
             user_ref = db.reference(f'/Users/{user_id}')
             user_data = user_ref.get()
             
             if user_data:
                 if isinstance(user_data, dict):
-                    user_record = user_data.copy()
-                    user_record['id'] = user_id
-                    user_record['uid'] = user_id
-                    
                     # Apply provider logic
                     provider_info = self._determine_provider_and_email(user_id, user_data)
-                    if provider_info['email']:
-                        user_record['email'] = provider_info['email']
-                    user_record['provider'] = provider_info['provider']
-                    user_record['emailVerified'] = provider_info['email_verified']
-                    
-                    return user_record
+                    # The snapshot belongs to this call: enrich it in place rather than copying it
+                    user_data['id'] = user_id
+                    user_data['uid'] = user_id
+                    user_data.update(self._provider_fields(provider_info))
+                    return user_data
                 else:
                     return {'id': user_id, 'uid': user_id, 'data': user_data, 'provider': 'google.com'}
             else:
-                if self.mode == 'dev':
-                    print(f"❌ User {user_id} not found")
+                logger.debug("User %s not found", user_id)
                 return {}
                 
         except Exception as e:
@@ -276,30 +728,34 @@ class FirebaseUserService:
             
             if effective_limit and len(data) > effective_limit:
                 print(f"🔧 Limiting to {effective_limit} records from {len(data)} total")
-                data_items = list(data.items())[:effective_limit]
-                data = dict(data_items)
+            else:
+                effective_limit = None
             
-            users_list = []
+            columns: Dict[str, List[Any]] = {}
+            row_count = 0
             
             if isinstance(data, dict):
-                for key, value in data.items():
+                # First N items streamed straight from the snapshot, without a list/dict rebuild
+                auth_records = self._fetch_auth_records([
+                    key for key, value in itertools.islice(data.items(), effective_limit)
+                    if isinstance(value, dict) and not value.get('email')
+                    and not _email_from_provider_data(value.get('providerData') or value.get('provider_data'))
+                ])
+                
+                for key, value in itertools.islice(data.items(), effective_limit):
                     if isinstance(value, dict):
-                        record = value.copy()
-                        if 'id' not in record:
-                            record['id'] = key
-                        if 'uid' not in record:
-                            record['uid'] = key
-                            
-                        # Apply provider logic
-                        provider_info = self._determine_provider_and_email(key, value)
-                        if provider_info['email']:
-                            record['email'] = provider_info['email']
-                        record['provider'] = provider_info['provider']
-                        record['emailVerified'] = provider_info['email_verified']
+                        # Apply provider logic; existing 'id' / 'uid' fields are kept
+                        provider_info = self._determine_provider_and_email(key, value, auth_records)
+                        derived = self._provider_fields(provider_info)
+                        if 'id' not in value:
+                            derived['id'] = key
+                        if 'uid' not in value:
+                            derived['uid'] = key
                         
-                        users_list.append(record)
+                        self._append_user_row(columns, value, derived, row_count)
+                        row_count += 1
             
-            df = pd.DataFrame(users_list)
+            df = pd.DataFrame(columns, copy=False)
             print(f"✅ Successfully fetched {len(df)} records from {path}")
             
             return df
@@ -315,32 +771,47 @@ class FirebaseUserService:
         try:
             print("📦 Exporting raw Firebase data...")
             
-            ref = db.reference('/Users')
-            users_data = ref.get()
+            # Apply dev mode limitation for export as well
+            limit = self.dev_user_limit if self.mode == 'dev' else None
+            if limit:
+                print(f"🔧 Development mode: exporting only first {limit} users")
+            
+            users_pages = self._user_pages(limit=limit)
+            first_page = next(users_pages, None)
             
-            if not users_data:
+            if not first_page:
                 print("❌ No data to export")
                 return ""
             
-            # Apply dev mode limitation for export as well
-            if self.mode == 'dev' and len(users_data) > self.dev_user_limit:
-                print(f"🔧 Development mode: exporting only first {self.dev_user_limit} users")
-                users_items = list(users_data.items())[:self.dev_user_limit]
-                users_data = dict(users_items)
-            
             # Generate filename if not provided
             if not output_filename:
-                from datetime import datetime
                 timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
                 mode_suffix = f"_{self.mode}" if self.mode == 'dev' else ""
                 output_filename = f"firebase_users_raw{mode_suffix}_{timestamp}.json"
             
-            # Save to JSON file
-            with open(output_filename, 'w', encoding='utf-8') as f:
-                json.dump(users_data, f, indent=2, ensure_ascii=False)
+            # Stream the JSON object one user at a time, page by page: neither the whole
+            # node nor its serialized form is ever held in memory. Indentation (about twice
+            # as slow to produce) is kept for dev mode only
+            indent = self.mode == 'dev'
+            entry_prefix = b'\n  ' if indent else b''
+            key_separator = b': ' if indent else b':'
+            exported_count = 0
+            
+            with open(output_filename, 'wb') as f:
+                f.write(b'{')
+                for users_page in itertools.chain([first_page], users_pages):
+                    for uid, user_info in users_page.items():
+                        value = _dump_json(user_info, indent)
+                        if indent:
+                            # Nest the value one level deeper (JSON strings never contain raw newlines)
+                            value = value.replace(b'\n', entry_prefix)
+                        f.write((b',' if exported_count else b'') + entry_prefix
+                                + _dump_json(uid, False) + key_separator + value)
+                        exported_count += 1
+                f.write(b'\n}\n' if indent else b'}\n')
             
             print(f"✅ Raw data exported to: {output_filename}")
-            print(f"📊 Exported {len(users_data)} users")
+            print(f"📊 Exported {exported_count} users")
             
             return output_filename
             
@@ -356,24 +827,27 @@ class FirebaseUserService:
             print("🔍 Exploring database structure...")
             print(f"🔧 Current mode: {self.mode.upper()}")
             
-            # Check root
+            # Check root: shallow read, only the top-level keys are transferred
             root_ref = db.reference('/')
-            root_data = root_ref.get()
+            root_data = root_ref.get(shallow=True)
             
             if root_data:
                 print(f"📋 Root keys: {list(root_data.keys())}")
                 
                 # Check Users specifically
                 if 'Users' in root_data:
-                    users_count = len(root_data['Users']) if isinstance(root_data['Users'], dict) else 0
+                    # Shallow read of /Users: uid -> True, without the user documents
+                    users_keys = db.reference('/Users').get(shallow=True)
+                    users_count = len(users_keys) if isinstance(users_keys, dict) else 0
                     print(f"👥 Total users in database: {users_count}")
                     
                     if self.mode == 'dev' and users_count > self.dev_user_limit:
                         print(f"🔧 In dev mode, will process only {self.dev_user_limit} users")
                     
                     if users_count > 0:
-                        sample_user_id = list(root_data['Users'].keys())[0]
-                        sample_user = root_data['Users'][sample_user_id]
+                        # A single user document for the sample
+                        sample_page = next(self._iter_user_pages(limit=1), {})
+                        sample_user = next(iter(sample_page.values()), None)
                         print(f"📝 Sample user structure: {list(sample_user.keys()) if isinstance(sample_user, dict) else 'Not a dict'}")
                         
                         # Check email presence
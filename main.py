@@ -3,22 +3,80 @@ from user_transformer import UserTransformerService
 from postgres_loader import PostgreSQLLoaderService
 import os
 import uuid
+import logging
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Iterator, Tuple
+import pandas as pd
 from dotenv import load_dotenv
 from sqlalchemy import text
 
-def generate_new_unique_id(existing_ids: list) -> str:
+logger = logging.getLogger(__name__)
+
+def generate_new_unique_ids(existing_ids: set, n: int) -> list:
     """
-    Génère un nouvel ID unique qui n'existe pas dans la liste des IDs existants
+    Génère n nouveaux IDs uniques absents de l'ensemble des IDs existants
+    
+    Les IDs générés sont ajoutés à existing_ids (pas de doublon entre deux appels)
     """
-    while True:
+    new_ids = []
+    while len(new_ids) < n:
         new_id = str(uuid.uuid4())[:20]  # Génère un ID de 20 caractères
         if new_id not in existing_ids:
-            return new_id
+            existing_ids.add(new_id)
+            new_ids.append(new_id)
+    return new_ids
+
+def resolve_conflicts(df: pd.DataFrame, existing_emails: set, existing_ids: set) -> Tuple[pd.DataFrame, int, int]:
+    """
+    Résout les conflits d'un lot d'utilisateurs avec les données déjà chargées
+    
+    Les utilisateurs dont l'email existe déjà sont écartés (contrainte UNIQUE sur email) ;
+    ceux dont l'ID existe déjà reçoivent un nouvel ID. Retourne (df, nombre écartés, nombre d'IDs
+    réattribués). existing_ids est complété par les IDs du lot en cas de réattribution
+    """
+    # Aucune donnée existante (premier chargement) : rien à comparer
+    if not existing_emails and not existing_ids:
+        return df, 0, 0
+    
+    # Users whose email is already loaded would violate the UNIQUE email constraint: skip them
+    email_conflicts = df['email'].isin(existing_emails)
+    skipped_count = int(email_conflicts.sum())
+    if skipped_count > 0:
+        # RangeIndex conservé : le chargeur adresse les lignes par position
+        df = df.drop(index=df.index[email_conflicts]).reset_index(drop=True)
+    
+    # Generate new IDs for any conflicts (hashed membership, one vectorized assignment)
+    id_conflicts = df['id'].isin(existing_ids)
+    conflict_count = int(id_conflicts.sum())
+    if conflict_count > 0:
+        # Les IDs du lot sont aussi exclus des nouveaux IDs
+        existing_ids.update(df['id'])
+        df.loc[id_conflicts, 'id'] = generate_new_unique_ids(existing_ids, conflict_count)
+    
+    return df, skipped_count, conflict_count
+
+def prefetch_pages(pages: Iterator[pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """
+    Itère sur pages en récupérant la page suivante dans un thread pendant que
+    l'appelant traite la page courante (extraction Firebase et chargement PostgreSQL se recouvrent)
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_page = executor.submit(next, pages, None)
+        while True:
+            page = next_page.result()
+            if page is None:
+                return
+            next_page = executor.submit(next, pages, None)
+            yield page
 
 def main():
     # Load environment variables from .env file
     load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     
+    firebase_service = None
     try:
         # Initialize services
         print("=== Initializing Services ===")
@@ -29,28 +87,60 @@ def main():
         # Debug database structure (optional)
         firebase_service.debug_database_structure()
         
-        print("\n=== Extracting raw users from Firebase ===")
+        # Export raw data for backup
+        raw_backup_file = firebase_service.export_raw_data()
+        print(f"Raw data backed up to: {raw_backup_file}")
         
-        # Get all users as raw data
-        raw_users_df = firebase_service.get_all_users_raw()
+        # Empty target table (first run): conflicts can only come from pages loaded by this
+        # run, tracked in memory, so the PostgreSQL conflict probe is skipped for every page
+        table_had_users = postgres_service.has_users()
+        loaded_ids = set()
+        loaded_emails = set()
         
-        print(f"Raw users extracted: {len(raw_users_df)}")
+        print("\n=== Extracting, transforming and loading users page by page ===")
         
-        if not raw_users_df.empty:
-            print(f"\n=== Raw Data Info ===")
-            print(f"Columns: {raw_users_df.columns.tolist()}")
-            print(f"Data types: {raw_users_df.dtypes.to_dict()}")
-            
-            # Export raw data for backup
-            raw_backup_file = firebase_service.export_raw_data()
-            print(f"Raw data backed up to: {raw_backup_file}")
+        # Users are streamed from Firebase: each page is transformed and loaded while
+        # the next one is fetched, only one page is held in memory
+        page_size = int(os.getenv('STREAM_PAGE_SIZE', '10000'))
+        # LOAD_METHOD : copy (défaut), rows (insertions individuelles), values (INSERT multi-lignes),
+        # upsert (fusion par id), stage (table temporaire sans index puis INSERT ... SELECT),
+        # asyncpg ou adbc ; une autre valeur lève ValueError au chargement
+        load_method = os.getenv('LOAD_METHOD', 'copy')
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        # Parquet par défaut (un fichier par page dans un répertoire), EXPORT_FORMAT=csv pour un seul CSV
+        export_csv = os.getenv('EXPORT_FORMAT', 'parquet').lower() == 'csv'
+        transformed_filename = f"transformed_users_{timestamp}.csv" if export_csv else f"transformed_users_{timestamp}"
+        
+        totals = {
+            'raw_users': 0,
+            'transformed_users': 0,
+            'successful_transformations': 0,
+            'failed_transformations': 0,
+            'duplicates_removed': 0,
+            'skipped_existing_emails': 0,
+            'id_conflicts': 0,
+            'total_processed': 0,
+            'inserted_count': 0,
+            'failed_count': 0
+        }
+        transformation_errors = []
+        load_errors = []
+        transformed_exported = False
+        
+        for page_number, raw_users_df in enumerate(prefetch_pages(firebase_service.iter_users_raw(page_size)), start=1):
+            totals['raw_users'] += len(raw_users_df)
+            print(f"\n=== Page {page_number}: {len(raw_users_df)} raw users ===")
             
-            # Show sample (first few rows)
-            print(f"\n=== Sample Raw Data ===")
-            print(raw_users_df.head())
+            if page_number == 1:
+                print(f"\n=== Raw Data Info ===")
+                print(f"Columns: {raw_users_df.columns.tolist()}")
+                print(f"Data types: {raw_users_df.dtypes.to_dict()}")
+                
+                # Show sample (first few rows)
+                print(f"\n=== Sample Raw Data ===")
+                print(raw_users_df.head())
             
             # ====== TRANSFORMATION PHASE ======
-            print(f"\n=== Starting Data Transformation ===")
             
             # Step 1: Validate required fields
             validation_result = transformer_service.validate_required_fields(raw_users_df)
@@ -66,45 +156,44 @@ def main():
                 # Try to fix missing required fields
                 if 'id' in validation_result['missing_required_fields']:
                     print("🔧 Generating missing IDs...")
-                    raw_users_df['id'] = raw_users_df.apply(lambda row: row.get('uid') or str(uuid.uuid4())[:20], axis=1)
+                    # uid quand il est renseigné, sinon un nouvel ID : une seule opération sur la colonne
+                    if 'uid' in raw_users_df.columns:
+                        new_ids = raw_users_df['uid'].astype(object)
+                    else:
+                        new_ids = pd.Series(None, index=raw_users_df.index, dtype=object)
+                    missing_ids = new_ids.isna() | (new_ids == '')
+                    new_ids = new_ids.mask(missing_ids, pd.Series(
+                        [str(uuid.uuid4())[:20] for _ in range(int(missing_ids.sum()))],
+                        index=raw_users_df.index[missing_ids], dtype=object
+                    ))
+                    raw_users_df['id'] = new_ids
                 
                 if 'email' in validation_result['missing_required_fields']:
                     print("❌ Cannot proceed without email field")
                     return
             
-            # Step 2: Transform users with deduplication
+            # Step 2: Transform users with deduplication (within the page; emails already
+            # loaded by a previous page are caught by the conflict check below)
             print(f"\n🔄 Transforming {len(raw_users_df)} users...")
             transformed_users_df = transformer_service.transform_users_dataframe(
-                raw_users_df, 
+                raw_users_df,
                 remove_duplicates=True
             )
             
-            print(f"✅ Transformation completed!")
-            print(f"Transformed users: {len(transformed_users_df)}")
-            
-            # Step 3: Get transformation report
+            # Step 3: Accumulate the transformation report
             transformation_report = transformer_service.get_transformation_report()
-            print(f"\n=== Transformation Report ===")
-            print(f"✅ Successful transformations: {transformation_report['successful_transformations']}")
-            print(f"❌ Failed transformations: {transformation_report['failed_transformations']}")
-            print(f"📊 Success rate: {transformation_report['success_rate']:.2f}%")
-            
-            if transformation_report['deduplication_stats']:
-                dedup_stats = transformation_report['deduplication_stats']
-                print(f"🧹 Duplicates removed: {dedup_stats.get('removed_count', 0)}")
-                if dedup_stats.get('duplicates_found', 0) > 0:
-                    print(f"🔍 Duplicate details: {dedup_stats.get('unique_duplicate_values', 0)} unique duplicate values")
+            totals['transformed_users'] += len(transformed_users_df)
+            totals['successful_transformations'] += transformation_report['successful_transformations']
+            totals['failed_transformations'] += transformation_report['failed_transformations']
+            totals['duplicates_removed'] += transformation_report['deduplication_stats'].get('removed_count', 0)
+            transformation_errors.extend(transformation_report['errors'])
             
-            # Show transformation errors if any
-            if transformation_report['errors']:
-                print(f"\n⚠️  Transformation Errors ({len(transformation_report['errors'])}):")
-                for i, error in enumerate(transformation_report['errors'][:5]):  # Show first 5 errors
-                    print(f"  {i+1}. User ID: {error['user_id']} - Error: {error['error']}")
-                if len(transformation_report['errors']) > 5:
-                    print(f"  ... and {len(transformation_report['errors']) - 5} more errors")
+            if transformed_users_df.empty:
+                print("❌ No users were successfully transformed in this page")
+                continue
             
             # Step 4: Show transformed data info
-            if not transformed_users_df.empty:
+            if page_number == 1:
                 print(f"\n=== Transformed Data Info ===")
                 print(f"Columns: {transformed_users_df.columns.tolist()}")
                 print(f"Data types: {transformed_users_df.dtypes.to_dict()}")
@@ -112,96 +201,140 @@ def main():
                 # Show sample transformed data
                 print(f"\n=== Sample Transformed Data ===")
                 print(transformed_users_df.head())
-                
-                # Step 5: Export transformed data
-                print(f"\n📦 Exporting transformed data...")
-                from datetime import datetime
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                transformed_filename = f"transformed_users_{timestamp}.csv"
-                
-                export_success = transformer_service.export_transformed_users(
-                    transformed_users_df, 
-                    transformed_filename
+            
+            # Step 5: Export transformed data (pages appended to a single CSV, or one Parquet file per page)
+            if export_csv:
+                transformer_service.export_transformed_users(
+                    transformed_users_df,
+                    transformed_filename,
+                    append=transformed_exported
                 )
-                
-                if export_success:
-                    print(f"✅ Transformed data exported successfully")
-                
-                # ====== LOADING PHASE ======
-                print(f"\n=== Starting Data Loading to PostgreSQL ===")
-                
-                # Step 6: Load to PostgreSQL
-                try:
-                    # Initialize PostgreSQL service here if not already done
-                    if 'postgres_service' not in locals():
-                        postgres_service = PostgreSQLLoaderService()
-                    
-                    # Check table info
-                    table_info = postgres_service.get_table_info()
-                    print(f"📋 Target table has {table_info.get('row_count', 0)} existing records")
-                    
-                    # Check if we need to generate new IDs for conflicts
-                    existing_ids = postgres_service.get_existing_user_ids()
-                    print(f"Found {len(existing_ids)} existing users in PostgreSQL")
-                    
-                    # Generate new IDs for any conflicts
-                    conflict_count = 0
-                    for idx, row in transformed_users_df.iterrows():
-                        if row['id'] in existing_ids:
-                            new_id = generate_new_unique_id(existing_ids)
-                            transformed_users_df.at[idx, 'id'] = new_id
-                            existing_ids.append(new_id)
-                            conflict_count += 1
+            else:
+                os.makedirs(transformed_filename, exist_ok=True)
+                transformer_service.export_transformed_users(
+                    transformed_users_df,
+                    os.path.join(transformed_filename, f"part-{page_number:05d}.parquet")
+                )
+            transformed_exported = True
+            
+            # ====== LOADING PHASE ======
+            
+            # Step 6: Load to PostgreSQL
+            try:
+                # One transaction per page around the conflict check and the load: a page that
+                # fails to load leaves no rows behind
+                with postgres_service.engine.begin() as connection:
+                    # Check if we need to generate new IDs for conflicts: the membership test runs
+                    # in PostgreSQL, only the conflicting keys come back. When the table was empty
+                    # before the run, the keys loaded by the previous pages are the only ones to check
+                    if table_had_users:
+                        conflicting_keys = postgres_service.find_conflicting_keys(transformed_users_df, connection=connection)
+                    else:
+                        conflicting_keys = {'ids': loaded_ids, 'emails': loaded_emails}
+                    transformed_users_df, skipped_count, conflict_count = resolve_conflicts(
+                        transformed_users_df,
+                        conflicting_keys['emails'],
+                        conflicting_keys['ids']
+                    )
+                    totals['skipped_existing_emails'] += skipped_count
+                    totals['id_conflicts'] += conflict_count
+                    logger.debug("Page %d: skipped %d users whose email already exists in PostgreSQL, "
+                                 "resolved %d ID conflicts by generating new IDs", page_number, skipped_count, conflict_count)
                     
-                    if conflict_count > 0:
-                        print(f"🔧 Resolved {conflict_count} ID conflicts by generating new IDs")
+                    if transformed_users_df.empty:
+                        continue
                     
                     # Load users to PostgreSQL
-                    load_result = postgres_service.load_users_dataframe(transformed_users_df)
+                    load_result = postgres_service.load_users_dataframe(
+                        transformed_users_df,
+                        method=load_method,
+                        connection=connection
+                    )
                     
-                    if load_result['success']:
-                        print(f"✅ Successfully loaded {load_result['inserted_count']} users to PostgreSQL")
-                        if load_result['failed_count'] > 0:
-                            print(f"⚠️  {load_result['failed_count']} users failed to load")
-                            
-                            # Show some failed user errors
-                            if load_result['errors']:
-                                print(f"\n⚠️  Loading Errors (first 3):")
-                                for i, error in enumerate(load_result['errors'][:3]):
-                                    print(f"  {i+1}. User ID: {error['user_id']} - Error: {error['error']}")
-                            
-                        # Show load statistics
-                        print(f"\n=== Loading Summary ===")
-                        print(f"📊 Total processed: {load_result['total_processed']}")
-                        print(f"✅ Successfully inserted: {load_result['inserted_count']}")
-                        print(f"❌ Failed insertions: {load_result['failed_count']}")
-                        print(f"📈 Success rate: {(load_result['inserted_count'] / load_result['total_processed']) * 100:.2f}%")
-                        
-                        # Get final database stats
-                        final_stats = postgres_service.get_user_stats()
-                        print(f"\n=== Final Database Stats ===")
-                        print(f"📊 Total users in database: {final_stats.get('total_users', 0)}")
-                        if final_stats.get('provider_distribution'):
-                            print(f"📊 Provider distribution: {final_stats['provider_distribution']}")
-                        
-                    else:
-                        print(f"❌ Loading failed: {load_result['error']}")
-                        
-                except Exception as e:
-                    print(f"❌ Error during loading phase: {e}")
-                    import traceback
-                    traceback.print_exc()
-
-            else:
-                print("❌ No users were successfully transformed")
+                    if not load_result['success']:
+                        # Rolls the page transaction back
+                        raise RuntimeError(f"Loading failed: {load_result['error']}")
                 
-        else:
+                if not table_had_users:
+                    loaded_ids.update(transformed_users_df['id'])
+                    loaded_emails.update(transformed_users_df['email'])
+                totals['total_processed'] += load_result['total_processed']
+                totals['inserted_count'] += load_result['inserted_count']
+                totals['failed_count'] += load_result['failed_count']
+                load_errors.extend(load_result['errors'])
+                print(f"✅ Page {page_number}: loaded {load_result['inserted_count']} users to PostgreSQL")
+            
+            except Exception as e:
+                print(f"❌ Error during loading phase: {e}")
+                traceback.print_exc()
+                return
+        
+        # Conflict resolution summary (per-page details at DEBUG level)
+        logger.info("Conflicts resolved: skipped=%d, reassigned=%d, inserted=%d",
+                    totals['skipped_existing_emails'], totals['id_conflicts'], totals['inserted_count'])
+        
+        if not totals['raw_users']:
             print("❌ No users found. Check your Firebase configuration.")
+            return
+        
+        print(f"\nRaw users extracted: {totals['raw_users']}")
+        
+        # Transformation report over all pages
+        total_transformations = totals['successful_transformations'] + totals['failed_transformations']
+        success_rate = (totals['successful_transformations'] / total_transformations * 100) if total_transformations > 0 else 0
+        print(f"\n=== Transformation Report ===")
+        print(f"✅ Successful transformations: {totals['successful_transformations']}")
+        print(f"❌ Failed transformations: {totals['failed_transformations']}")
+        print(f"📊 Success rate: {success_rate:.2f}%")
+        print(f"🧹 Duplicates removed: {totals['duplicates_removed']}")
+        
+        # Show transformation errors if any
+        if transformation_errors:
+            print(f"\n⚠️  Transformation Errors ({len(transformation_errors)}):")
+            for i, error in enumerate(transformation_errors[:5]):  # Show first 5 errors
+                print(f"  {i+1}. User ID: {error['user_id']} - Error: {error['error']}")
+            if len(transformation_errors) > 5:
+                print(f"  ... and {len(transformation_errors) - 5} more errors")
+        
+        if not totals['transformed_users']:
+            print("❌ No users were successfully transformed")
+            return
+        
+        print(f"✅ Transformed data exported to: {transformed_filename}")
+        
+        if totals['failed_count'] > 0:
+            print(f"⚠️  {totals['failed_count']} users failed to load")
             
+            # Show some failed user errors
+            if load_errors:
+                print(f"\n⚠️  Loading Errors (first 3):")
+                for i, error in enumerate(load_errors[:3]):
+                    print(f"  {i+1}. User ID: {error['user_id']} - Error: {error['error']}")
+        
+        # Show load statistics
+        print(f"\n=== Loading Summary ===")
+        print(f"⏭️  Skipped (email already loaded): {totals['skipped_existing_emails']}")
+        print(f"🔧 ID conflicts resolved: {totals['id_conflicts']}")
+        print(f"📊 Total processed: {totals['total_processed']}")
+        print(f"✅ Successfully inserted: {totals['inserted_count']}")
+        print(f"❌ Failed insertions: {totals['failed_count']}")
+        if totals['total_processed'] > 0:
+            print(f"📈 Success rate: {(totals['inserted_count'] / totals['total_processed']) * 100:.2f}%")
+        
+        # Get final database stats
+        final_stats = postgres_service.get_user_stats()
+        print(f"\n=== Final Database Stats ===")
+        print(f"📊 Total users in database: {final_stats.get('total_users', 0)}")
+        if final_stats.get('provider_distribution'):
+            print(f"📊 Provider distribution: {final_stats['provider_distribution']}")
+    
     except Exception as e:
         print(f"❌ Error in main execution: {e}")
-        import traceback
         traceback.print_exc()
+    finally:
+        # Flushes and closes the on-disk Auth cache
+        if firebase_service is not None:
+            firebase_service.close()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
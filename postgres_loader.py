@@ -1,21 +1,82 @@
 import pandas as pd
+import io
 import os
-from typing import Dict, Any, List, Optional
+import logging
+from typing import Dict, Any, Callable, Iterable, List, Optional, Set, Tuple
 from sqlalchemy import create_engine, text, inspect
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import NullPool
 import psycopg2
+from psycopg2.extras import execute_batch, execute_values
 from datetime import datetime
 import uuid
 import numpy as np
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    # Chargement optionnel par COPY binaire (LOAD_METHOD=asyncpg)
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+try:
+    # Ingestion Arrow optionnelle (LOAD_METHOD=adbc)
+    import pyarrow as pa
+    import adbc_driver_postgresql.dbapi as adbc_postgresql
+except ImportError:
+    pa = None
+    adbc_postgresql = None
+
+# Diagnostics par lot et par ligne via ce logger (DEBUG) plutôt que print dans les boucles
+logger = logging.getLogger(__name__)
+
+# Requêtes fixes compilées une seule fois au chargement du module (réutilisées à chaque appel)
+SELECT_ONE_QUERY = text("SELECT 1")
+SELECT_USER_IDS_QUERY = text('SELECT id FROM public."User"')
+SELECT_USER_EMAILS_QUERY = text('SELECT email FROM public."User"')
+SELECT_USER_KEYS_QUERY = text('SELECT id, email FROM public."User"')
+COUNT_USERS_QUERY = text('SELECT COUNT(*) FROM public."User"')
+HAS_USERS_QUERY = text('SELECT EXISTS (SELECT 1 FROM public."User")')
+DELETE_USER_QUERY = text('DELETE FROM public."User" WHERE id = :user_id')
+TABLE_EXISTS_QUERY = text('''
+    SELECT EXISTS (
+        SELECT FROM information_schema.tables
+        WHERE table_schema = :schema
+        AND table_name = :table
+    )
+''')
+# Statistiques en un seul parcours de la table : une ligne par provider (grouping 1), par
+# valeur de "emailVerified" (grouping 2) et une ligne de total (grouping 3)
+USER_STATS_QUERY = text('''
+    SELECT GROUPING(provider, "emailVerified"), provider, "emailVerified", COUNT(*),
+           COUNT(*) FILTER (WHERE "createdAt" >= NOW() - INTERVAL '30 days')
+    FROM public."User"
+    GROUP BY GROUPING SETS ((provider), ("emailVerified"), ())
+''')
+
+# Lignes par lot selon la méthode de chargement : COPY amortit son coût fixe sur de bien plus
+# gros lots qu'un INSERT multi-lignes
+DEFAULT_CHUNK_SIZES = {'copy': 50_000, 'upsert': 50_000, 'stage': 50_000, 'asyncpg': 50_000, 'adbc': 50_000, 'values': 10_000}
+# Séparateur provisoire des éléments d'une liste d'intérêts, remplacé après échappement des quotes
+ARRAY_ITEM_SEPARATOR = '\x1f'
+# Lignes lues par paquet sur les curseurs côté serveur (clés existantes)
+STREAM_FETCH_SIZE = 10_000
+# Sous-lots execute_values d'un lot rejeté dont l'insertion via table temporaire échoue aussi
+FALLBACK_BATCH_SIZE = 1000
+# Empreinte mémoire visée par lot : les lignes volumineuses donnent des lots plus petits
+TARGET_CHUNK_BYTES = 64 * 1024 * 1024
 
 class PostgreSQLLoaderService:
     """
     Service pour charger les données transformées dans PostgreSQL
     """
     
-    def __init__(self):
+    def __init__(self, use_null_pool: bool = False):
         """
         Initialize PostgreSQL connection
+        
+        use_null_pool : une connexion neuve par utilisation, sans pool (chargement ponctuel)
         """
         try:
             # Get database connection parameters from environment
@@ -25,11 +86,44 @@ class PostgreSQLLoaderService:
             self.db_user = os.getenv('POSTGRES_USER', 'user')
             self.db_password = os.getenv('POSTGRES_PASSWORD', 'password')
             
+            # Nombre de lignes par lot (une transaction par lot) ; par défaut selon la méthode
+            self.load_chunk_size = int(os.getenv('LOAD_CHUNK_SIZE', '0')) or None
+            # Nombre de COPY exécutés en parallèle (une connexion chacun)
+            self.load_concurrency = int(os.getenv('LOAD_CONCURRENCY', '4'))
+            # Existence de la table User, mémorisée une fois vérifiée (ou créée)
+            self._table_exists = False
+            # Plans de chargement (colonnes et requêtes) par jeu de colonnes du DataFrame
+            self._load_plans: Dict[Tuple[str, ...], Dict[str, Any]] = {}
+            # INSERT ligne par ligne (paramètres positionnels) par jeu de colonnes non nulles et mode
+            # (insertion simple ou upsert par id)
+            self._insert_statements: Dict[Tuple[Tuple[str, ...], bool], str] = {}
+            
             # Create connection string
             self.connection_string = f"postgresql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
             
             # Create SQLAlchemy engine
-            self.engine = create_engine(self.connection_string)
+            # executemany psycopg2 : INSERT multi-lignes par pages de 1000, autres requêtes groupées
+            # par execute_batch (500 jeux de paramètres par aller-retour)
+            executemany_options = {
+                'executemany_mode': 'values_plus_batch',
+                'insertmanyvalues_page_size': 1000,
+                'executemany_batch_page_size': 500
+            }
+            if use_null_pool:
+                self.engine = create_engine(self.connection_string, poolclass=NullPool, **executemany_options)
+            else:
+                # Une connexion par COPY parallèle plus celle de la transaction de page, gardées
+                # ouvertes entre les lots ; LIFO réutilise les connexions les plus récentes. Pas de
+                # ping à chaque emprunt : pool_recycle renouvelle les connexions anciennes
+                self.engine = create_engine(
+                    self.connection_string,
+                    pool_size=self.load_concurrency + 1,
+                    max_overflow=self.load_concurrency,
+                    pool_pre_ping=False,
+                    pool_recycle=3600,
+                    pool_use_lifo=True,
+                    **executemany_options
+                )
             
             # Test connection
             self._test_connection()
@@ -44,51 +138,255 @@ class PostgreSQLLoaderService:
         """Test the database connection"""
         try:
             with self.engine.connect() as conn:
-                result = conn.execute(text("SELECT 1"))
+                result = conn.execute(SELECT_ONE_QUERY)
                 result.fetchone()
             print("✅ Database connection test successful")
         except Exception as e:
             print(f"❌ Database connection test failed: {e}")
             raise
 
-    def get_existing_user_ids(self) -> List[str]:
+    def _run_raw(self, work: Callable[[Any], Any], connection=None) -> Any:
+        """
+        Exécute work(cursor) sur un curseur psycopg2 et retourne son résultat
+        
+        Avec connection (Connection SQLAlchemy ouverte par engine.begin()), le curseur est pris
+        sur sa connexion DBAPI et la transaction reste à l'appelant ; sinon une connexion du
+        pool est utilisée, validée (ou annulée) puis rendue
+        """
+        if connection is not None:
+            with connection.connection.cursor() as cursor:
+                return work(cursor)
+        
+        raw_conn = self.engine.raw_connection()
+        try:
+            with raw_conn.cursor() as cursor:
+                result = work(cursor)
+            raw_conn.commit()
+            return result
+        except Exception:
+            raw_conn.rollback()
+            raise
+        finally:
+            raw_conn.close()
+
+    def _load_plan(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Colonnes chargées et requêtes de chargement en masse pour les colonnes de df
+        
+        Construit une seule fois par jeu de colonnes (toutes les pages d'un export ont les mêmes)
+        puis réutilisé pour chaque lot
+        """
+        key = tuple(df.columns)
+        plan = self._load_plans.get(key)
+        if plan is not None:
+            return plan
+        
+        # Mêmes colonnes exclues que pour l'insertion ligne par ligne
+        problematic_columns = ['birthdate']
+        columns = [col for col in key if col not in problematic_columns]
+        
+        column_list = ', '.join(f'"{col}"' for col in columns)
+        # Une seule ligne par email depuis la table temporaire (doublons internes au lot)
+        distinct_email = 'DISTINCT ON ("email") ' if 'email' in columns else ''
+        update_set = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in columns if col != 'id')
+        plan = {
+            'columns': columns,
+            'copy': f"""
+                COPY public."User" ({column_list})
+                FROM STDIN WITH (FORMAT CSV, DELIMITER E'\\t', NULL '\\N')
+            """,
+            'stage_copy': f"""
+                COPY user_stage ({column_list})
+                FROM STDIN WITH (FORMAT CSV, DELIMITER E'\\t', NULL '\\N')
+            """,
+            'stage_merge': f"""
+                INSERT INTO public."User" ({column_list})
+                SELECT DISTINCT ON ("id") {column_list} FROM user_stage
+                ON CONFLICT (id) DO {f'UPDATE SET {update_set}' if update_set else 'NOTHING'}
+            """,
+            'stage_insert': f"""
+                INSERT INTO public."User" ({column_list})
+                SELECT {column_list} FROM user_stage
+                ON CONFLICT DO NOTHING
+                RETURNING id
+            """,
+            'stage_load': f"""
+                INSERT INTO public."User" ({column_list})
+                SELECT {distinct_email}{column_list} FROM user_stage
+                ON CONFLICT DO NOTHING
+            """,
+            'values': f'INSERT INTO public."User" ({column_list}) VALUES %s'
+        }
+        self._load_plans[key] = plan
+        return plan
+
+    def _auto_chunk_size(self, df: pd.DataFrame, method: str) -> int:
+        """
+        Lignes par lot pour viser TARGET_CHUNK_BYTES, entre 1 000 et DEFAULT_CHUNK_SIZES[method]
+        
+        La taille moyenne d'une ligne est estimée sur les 1 000 premières lignes
+        """
+        max_rows = DEFAULT_CHUNK_SIZES.get(method, 50_000)
+        sample = df.head(1000)
+        if sample.empty:
+            return max_rows
+        
+        row_bytes = sample.memory_usage(deep=True, index=False).sum() / len(sample)
+        return max(1000, min(max_rows, int(TARGET_CHUNK_BYTES / max(row_bytes, 64))))
+
+    def _users_copy_buffer(self, df: pd.DataFrame) -> Tuple[List[str], io.StringIO]:
+        """
+        Colonnes chargées et tampon texte (tabulations, NULL '\\N') prêt pour COPY FROM STDIN
+        """
+        columns = self._load_plan(df)['columns']
+        
+        buffer = io.StringIO()
+        df[columns].to_csv(buffer, index=False, header=False, sep='\t', na_rep='\\N')
+        buffer.seek(0)
+        return columns, buffer
+
+    def _users_copy_records(self, df: pd.DataFrame) -> Tuple[List[str], List[tuple]]:
+        """
+        Colonnes chargées et lignes en tuples Python (NaN/NaT -> None) pour un COPY binaire
+        """
+        columns = self._load_plan(df)['columns']
+        return columns, self._rows_with_nulls(df, columns)
+
+    def _rows_with_nulls(self, df: pd.DataFrame, columns: List[str]) -> List[tuple]:
+        """
+        Lignes de df[columns] en tuples, NaN/NaT remplacés par None (NULL pour les pilotes)
+        
+        Seules les colonnes qui ont des valeurs manquantes sont recopiées (en objets) ; les autres
+        sont lues telles quelles, sans conversion ni masque sur tout le DataFrame
+        """
+        arrays = []
+        for col in columns:
+            series = df[col]
+            missing = series.isna().to_numpy()
+            if missing.any():
+                values = series.to_numpy(dtype=object, copy=True)
+                values[missing] = None
+                arrays.append(values)
+            else:
+                arrays.append(series)
+        return list(zip(*arrays))
+
+    def get_existing_user_ids(self) -> Set[str]:
         """
         Récupère tous les IDs d'utilisateurs existants dans la base de données
         """
         try:
             with self.engine.connect() as conn:
-                query = text('SELECT id FROM public."User"')
-                result = conn.execute(query)
-                existing_ids = [row[0] for row in result.fetchall()]
+                # Curseur côté serveur : lignes lues par paquets, sans liste intermédiaire
+                result = conn.execution_options(stream_results=True, yield_per=STREAM_FETCH_SIZE) \
+                    .execute(SELECT_USER_IDS_QUERY)
+                existing_ids = {row[0] for row in result}
                 
             print(f"📊 Found {len(existing_ids)} existing users in database")
             return existing_ids
             
         except Exception as e:
             print(f"❌ Error fetching existing user IDs: {e}")
-            return []
+            return set()
 
-    def get_existing_user_emails(self) -> List[str]:
+    def get_existing_user_emails(self) -> Set[str]:
         """
         Récupère tous les emails d'utilisateurs existants dans la base de données
         """
         try:
             with self.engine.connect() as conn:
-                query = text('SELECT email FROM public."User"')
-                result = conn.execute(query)
-                existing_emails = [row[0] for row in result.fetchall()]
+                result = conn.execution_options(stream_results=True, yield_per=STREAM_FETCH_SIZE) \
+                    .execute(SELECT_USER_EMAILS_QUERY)
+                existing_emails = {row[0] for row in result}
                 
             print(f"📊 Found {len(existing_emails)} existing user emails in database")
             return existing_emails
             
         except Exception as e:
             print(f"❌ Error fetching existing user emails: {e}")
-            return []
+            return set()
+
+    def get_existing_user_keys(self) -> Tuple[Set[str], Set[str]]:
+        """
+        Récupère en une seule requête les IDs et les emails existants (ensembles)
+        """
+        try:
+            existing_ids = set()
+            existing_emails = set()
+            with self.engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=STREAM_FETCH_SIZE) \
+                    .execute(SELECT_USER_KEYS_QUERY)
+                for user_id, email in result:
+                    existing_ids.add(user_id)
+                    existing_emails.add(email)
+                
+            print(f"📊 Found {len(existing_ids)} existing users in database")
+            return existing_ids, existing_emails
+            
+        except Exception as e:
+            print(f"❌ Error fetching existing user keys: {e}")
+            return set(), set()
+
+    def has_users(self) -> bool:
+        """
+        Indique si la table User contient au moins une ligne (EXISTS : pas de parcours complet
+        comme COUNT(*)). Une table absente est considérée comme vide
+        """
+        try:
+            with self.engine.connect() as conn:
+                return bool(conn.execute(HAS_USERS_QUERY).scalar())
+                
+        except Exception as e:
+            print(f"⚠️  Could not check whether table User has rows: {e}")
+            return False
+
+    def find_conflicting_keys(self, df: pd.DataFrame, connection=None) -> Dict[str, set]:
+        """
+        Renvoie les ids et emails du DataFrame déjà présents dans la table User
+        
+        Les clés entrantes sont copiées (COPY) dans une table temporaire et jointes côté
+        serveur : seules les clés en conflit transitent, pas toute la table. Avec connection
+        (Connection SQLAlchemy ouverte par engine.begin()), la requête s'exécute dans la
+        transaction de l'appelant
+        """
+        buffer = io.StringIO()
+        df[['id', 'email']].to_csv(buffer, index=False, header=False, sep='\t', na_rep='\\N')
+        buffer.seek(0)
+        
+        def probe(cursor) -> Tuple[set, set]:
+            # La table temporaire vit jusqu'à la fin de la transaction : vidée si déjà créée
+            cursor.execute("""
+                CREATE TEMP TABLE IF NOT EXISTS incoming_user_keys (id VARCHAR(255), email VARCHAR(255))
+                ON COMMIT DROP
+            """)
+            cursor.execute("TRUNCATE incoming_user_keys")
+            cursor.copy_expert("""
+                COPY incoming_user_keys (id, email)
+                FROM STDIN WITH (FORMAT CSV, DELIMITER E'\\t', NULL '\\N')
+            """, buffer)
+            
+            cursor.execute('SELECT k.id FROM incoming_user_keys k JOIN public."User" u ON u.id = k.id')
+            ids = {row[0] for row in cursor.fetchall()}
+            
+            cursor.execute('SELECT k.email FROM incoming_user_keys k JOIN public."User" u ON u.email = k.email')
+            emails = {row[0] for row in cursor.fetchall()}
+            return ids, emails
+        
+        conflicting_ids, conflicting_emails = self._run_raw(probe, connection)
+        
+        print(f"📊 Found {len(conflicting_ids)} conflicting IDs and {len(conflicting_emails)} conflicting emails in database")
+        return {'ids': conflicting_ids, 'emails': conflicting_emails}
 
     def check_table_exists(self) -> bool:
         """
         Vérifie si la table User existe
+        
+        Une fois la table trouvée, le résultat est gardé sur l'instance : les chargements
+        suivants (un par page) ne relisent plus le catalogue
         """
+        if self._table_exists:
+            return True
+        
         try:
             inspector = inspect(self.engine)
             tables = inspector.get_table_names(schema='public')
@@ -98,7 +396,8 @@ class PostgreSQLLoaderService:
                 print("✅ Table 'User' exists")
             else:
                 print("❌ Table 'User' does not exist")
-                
+            
+            self._table_exists = exists
             return exists
             
         except Exception as e:
@@ -121,8 +420,7 @@ class PostgreSQLLoaderService:
             
             # Get row count
             with self.engine.connect() as conn:
-                count_query = text('SELECT COUNT(*) FROM public."User"')
-                result = conn.execute(count_query)
+                result = conn.execute(COUNT_USERS_QUERY)
                 row_count = result.fetchone()[0]
             
             info = {
@@ -139,106 +437,126 @@ class PostgreSQLLoaderService:
             print(f"❌ Error getting table info: {e}")
             return {}
 
-    def _clean_dataframe_for_postgres(self, df: pd.DataFrame) -> pd.DataFrame:
+    def _clean_dataframe_for_postgres(self, df: pd.DataFrame, inplace: bool = False) -> pd.DataFrame:
         """
         Nettoie le DataFrame pour PostgreSQL en gérant NaT et autres valeurs problématiques
+        
+        Chaque colonne nettoyée est remplacée entière, jamais modifiée cellule par cellule : sans
+        inplace, une copie superficielle (tableaux partagés) suffit à laisser df intact
         """
-        df_clean = df.copy()
+        df_clean = df if inplace else df.copy(deep=False)
         
         # Convert datetime columns and handle NaT de manière plus agressive
         datetime_columns = ['createdAt', 'updatedAt', 'birthdate', 'lastConnexion']
-        for col in datetime_columns:
-            if col in df_clean.columns:
-                print(f"🧹 Cleaning datetime column: {col}")
+        
+        # Méthode plus agressive pour nettoyer les NaT (repli cellule par cellule)
+        def ultra_clean_datetime(val):
+            try:
+                # Vérifications multiples pour NaT
+                if val is None:
+                    return None
+                if pd.isna(val):
+                    return None
+                if hasattr(val, '__str__'):
+                    val_str = str(val).lower().strip()
+                    if val_str in ['nat', 'none', 'null', '', 'nan']:
+                        return None
                 
-                # Méthode plus agressive pour nettoyer les NaT
-                def ultra_clean_datetime(val):
+                # Si c'est un pandas NaT spécifique
+                if hasattr(val, '_value') and pd.isna(val):
+                    return None
+                    
+                # Si c'est déjà un datetime, le garder
+                if isinstance(val, datetime):
+                    return val
+                    
+                # Essayer de convertir
+                if isinstance(val, str) and val.strip():
                     try:
-                        # Vérifications multiples pour NaT
-                        if val is None:
-                            return None
-                        if pd.isna(val):
+                        converted = pd.to_datetime(val, errors='coerce')
+                        if pd.isna(converted):
                             return None
-                        if hasattr(val, '__str__'):
-                            val_str = str(val).lower().strip()
-                            if val_str in ['nat', 'none', 'null', '', 'nan']:
-                                return None
+                        return converted.to_pydatetime()
+                    except:
+                        return None
                         
-                        # Si c'est un pandas NaT spécifique
-                        if hasattr(val, '_value') and pd.isna(val):
-                            return None
-                            
-                        # Si c'est déjà un datetime, le garder
-                        if isinstance(val, datetime):
-                            return val
-                            
-                        # Essayer de convertir
-                        if isinstance(val, str) and val.strip():
-                            try:
-                                converted = pd.to_datetime(val, errors='coerce')
-                                if pd.isna(converted):
-                                    return None
-                                return converted.to_pydatetime()
-                            except:
-                                return None
-                                
-                        # Pour tout le reste, essayer pandas to_datetime
-                        try:
-                            converted = pd.to_datetime(val, errors='coerce')
-                            if pd.isna(converted):
-                                return None
-                            return converted.to_pydatetime()
-                        except:
-                            return None
-                            
-                    except Exception as e:
-                        print(f"⚠️  Error cleaning datetime value {val}: {e}")
+                # Pour tout le reste, essayer pandas to_datetime
+                try:
+                    converted = pd.to_datetime(val, errors='coerce')
+                    if pd.isna(converted):
                         return None
+                    return converted.to_pydatetime()
+                except:
+                    return None
+                    
+            except Exception as e:
+                logger.debug("Error cleaning datetime value %r: %s", val, e)
+                return None
+        
+        for col in datetime_columns:
+            if col in df_clean.columns:
+                logger.debug("Cleaning datetime column: %s", col)
+                column = df_clean[col]
                 
-                # Appliquer le nettoyage ultra
-                df_clean[col] = df_clean[col].apply(ultra_clean_datetime)
+                # Déjà en datetime64 (sortie du transformateur) : les NaT sont écrits NULL par COPY
+                # et remplacés par None pour les insertions, rien à convertir
+                if pd.api.types.is_datetime64_any_dtype(column):
+                    continue
                 
-                # Vérification finale : s'assurer qu'il n'y a plus de NaT
-                nat_count = 0
-                for idx, val in enumerate(df_clean[col]):
-                    try:
-                        if pd.isna(val) or str(val).lower() == 'nat':
-                            df_clean.at[idx, col] = None
-                            nat_count += 1
-                    except:
-                        df_clean.at[idx, col] = None
-                        nat_count += 1
+                # Conversion vectorisée (chaque valeur analysée selon son propre format) ; les
+                # valeurs perdues (NaT) qui ne sont pas de simples marqueurs vides (datetime hors
+                # plage...) ou les fuseaux mélangés gardent le nettoyage cellule par cellule
+                try:
+                    parsed = pd.to_datetime(column, errors='coerce', format='mixed')
+                except (ValueError, TypeError, OverflowError):
+                    parsed = None
+                
+                if parsed is not None and pd.api.types.is_datetime64_any_dtype(parsed):
+                    lost = (parsed.isna() & column.notna()).to_numpy()
+                    if not lost.any() or column[lost].map(ultra_clean_datetime).isna().all():
+                        df_clean[col] = parsed
+                        continue
                 
-                if nat_count > 0:
-                    print(f"🧹 Cleaned {nat_count} remaining NaT values in {col}")
+                # Appliquer le nettoyage ultra
+                df_clean[col] = column.apply(ultra_clean_datetime)
         
         # Handle UserStatus enum values
         if 'status' in df_clean.columns:
-            df_clean['status'] = df_clean['status'].apply(
-                lambda x: x.value if hasattr(x, 'value') else str(x) if x is not None else 'ACTIVE'
-            )
+            # Peu de statuts distincts : convertir les valeurs uniques puis mapper la colonne
+            status_to_text = lambda x: x.value if hasattr(x, 'value') else str(x) if x is not None else 'ACTIVE'
+            status_values = {value: status_to_text(value) for value in df_clean['status'].unique()}
+            df_clean['status'] = df_clean['status'].map(status_values)
         
         # Handle interests array
         if 'interests' in df_clean.columns:
-            df_clean['interests'] = df_clean['interests'].apply(self._format_array_for_postgres)
+            df_clean['interests'] = self._format_interests_column(df_clean['interests'])
         
         # Handle boolean columns
+        # (déjà bool en sortie du transformateur : seules les autres colonnes sont converties, toutes
+        # en une passe NumPy)
         bool_columns = ['emailVerified', 'phoneVerified']
-        for col in bool_columns:
-            if col in df_clean.columns:
-                df_clean[col] = df_clean[col].fillna(False).astype(bool)
+        present_bools = [col for col in bool_columns if col in df_clean.columns and df_clean[col].dtype != bool]
+        if present_bools:
+            values = df_clean[present_bools].to_numpy(dtype=object)
+            values[pd.isna(values)] = False
+            df_clean[present_bools] = values.astype(bool)
         
         # Handle string columns - replace NaN with None
+        # (un seul tableau objet pour toutes les colonnes, réécrit seulement s'il manque des valeurs)
         string_columns = ['password', 'uid', 'profilePic', 'phoneNumber', 'name', 'city', 'photo']
-        for col in string_columns:
-            if col in df_clean.columns:
-                df_clean[col] = df_clean[col].where(pd.notna(df_clean[col]), None)
+        present_strings = [col for col in string_columns if col in df_clean.columns]
+        if present_strings:
+            values = df_clean[present_strings].to_numpy(dtype=object)
+            missing = pd.isna(values)
+            if missing.any():
+                values[missing] = None
+                df_clean[present_strings] = values
         
         # Ensure required columns have values
         if 'provider' in df_clean.columns:
             df_clean['provider'] = df_clean['provider'].fillna('CREDENTIALS')
         
-        print(f"🧹 Cleaned DataFrame: {len(df_clean)} rows ready for PostgreSQL")
+        logger.debug("Cleaned DataFrame: %d rows ready for PostgreSQL", len(df_clean))
         return df_clean
 
     def _final_clean_value(self, value: Any) -> Any:
@@ -290,40 +608,256 @@ class PostgreSQLLoaderService:
         # Si on arrive ici, la valeur devrait être saine
         return value
 
-    def _insert_single_user(self, user_data: Dict[str, Any]) -> None:
+    def _user_insert_values(self, user_data: Dict[str, Any]) -> Tuple[Tuple[str, ...], List[Any]]:
         """
-        Insère un seul utilisateur en excluant temporairement les colonnes problématiques
+        Colonnes renseignées (hors colonnes problématiques) et valeurs correspondantes d'un utilisateur
+        
+        Les colonnes à None sont omises : la base applique leurs valeurs par défaut
         """
-        with self.engine.connect() as conn:
-            with conn.begin():  # Individual transaction
-                # Liste des colonnes à exclure temporairement si elles causent des problèmes
-                problematic_columns = ['birthdate']  # Ajouter d'autres si nécessaire
-                
-                columns = []
-                placeholders = []
-                clean_params = {}
-                
-                for key, value in user_data.items():
-                    # Skip les colonnes problématiques pour l'instant
-                    if key in problematic_columns:
-                        continue
-                        
-                    cleaned_value = self._final_clean_value(value)
-                    
-                    if cleaned_value is not None:
-                        columns.append(f'"{key}"')
-                        placeholders.append(f':{key}')
-                        clean_params[key] = cleaned_value
-                
-                if not columns:
-                    raise ValueError("No valid data to insert")
-                
-                query = f"""
-                    INSERT INTO public."User" ({', '.join(columns)})
-                    VALUES ({', '.join(placeholders)})
-                """
+        # Liste des colonnes à exclure temporairement si elles causent des problèmes
+        problematic_columns = ['birthdate']  # Ajouter d'autres si nécessaire
+        
+        columns = []
+        values = []
+        
+        for key, value in user_data.items():
+            # Skip les colonnes problématiques pour l'instant
+            if key in problematic_columns:
+                continue
                 
-                conn.execute(text(query), clean_params)
+            if value is not None:
+                columns.append(key)
+                values.append(value)
+        
+        return tuple(columns), values
+
+    def _insert_statement(self, columns: Tuple[str, ...], upsert: bool = False) -> str:
+        """
+        INSERT à paramètres positionnels (%s) pour un jeu de colonnes, construit une seule fois
+        
+        Réutilisé pour toutes les lignes qui ont les mêmes colonnes renseignées. Avec upsert, un id
+        existant est mis à jour (ON CONFLICT (id) DO UPDATE) sur les seules colonnes renseignées
+        """
+        key = (columns, upsert)
+        query = self._insert_statements.get(key)
+        if query is None:
+            on_conflict = ''
+            if upsert:
+                update_set = ', '.join(f'"{col}" = EXCLUDED."{col}"' for col in columns if col != 'id')
+                on_conflict = f"ON CONFLICT (id) DO {f'UPDATE SET {update_set}' if update_set else 'NOTHING'}"
+            query = f"""
+                INSERT INTO public."User" ({', '.join(f'"{col}"' for col in columns)})
+                VALUES ({', '.join(['%s'] * len(columns))})
+                {on_conflict}
+            """
+            self._insert_statements[key] = query
+        return query
+
+    def _insert_users_group(self, columns: Tuple[str, ...], rows: List[List[Any]], connection=None,
+                            upsert: bool = False) -> int:
+        """
+        Insère des lignes qui ont le même jeu de colonnes avec une seule requête préparée côté
+        client (execute_batch : plusieurs INSERT par aller-retour) et retourne leur nombre
+        
+        Tout ou rien : avec connection, dans un SAVEPOINT de la transaction de l'appelant
+        """
+        query = self._insert_statement(columns, upsert)
+        
+        def insert(cursor) -> int:
+            execute_batch(cursor, query, rows, page_size=FALLBACK_BATCH_SIZE)
+            return len(rows)
+        
+        if connection is not None:
+            with connection.begin_nested():
+                return self._run_raw(insert, connection)
+        return self._run_raw(insert)
+
+    def _insert_single_user(self, user_data: Dict[str, Any], connection=None, upsert: bool = False) -> None:
+        """
+        Insère un seul utilisateur en excluant temporairement les colonnes problématiques
+        
+        Avec connection, l'insertion se fait dans un SAVEPOINT de la transaction de l'appelant
+        (un échec n'annule que cette ligne). Avec upsert, un id existant est mis à jour
+        
+        user_data doit déjà être nettoyé (valeurs manquantes à None, cf. _rows_with_nulls) : les
+        valeurs None sont seulement écartées, sans _final_clean_value par valeur
+        """
+        columns, values = self._user_insert_values(user_data)
+        
+        if not columns:
+            raise ValueError("No valid data to insert")
+        
+        query = self._insert_statement(columns, upsert)
+        
+        def insert(cursor) -> None:
+            cursor.execute(query, values)
+        
+        if connection is not None:
+            with connection.begin_nested():
+                self._run_raw(insert, connection)
+            return
+        
+        # Individual transaction
+        self._run_raw(insert)
+
+    def _copy_users_dataframe(self, df: pd.DataFrame, connection=None) -> int:
+        """
+        Charge le DataFrame nettoyé via COPY FROM STDIN et retourne le nombre de lignes insérées
+        
+        Sans connection, le COPY a sa propre connexion et sa propre transaction
+        """
+        copy_query = self._load_plan(df)['copy']
+        _, buffer = self._users_copy_buffer(df)
+        
+        def copy(cursor) -> int:
+            cursor.copy_expert(copy_query, buffer)
+            return cursor.rowcount
+        
+        return self._run_raw(copy, connection)
+
+    def _upsert_users_dataframe(self, df: pd.DataFrame, connection=None) -> int:
+        """
+        Insère ou met à jour (par id) les utilisateurs du DataFrame nettoyé et retourne le nombre
+        de lignes écrites
+        
+        Le lot est copié (COPY) dans une table temporaire puis fusionné par un seul
+        INSERT ... SELECT ... ON CONFLICT (id) DO UPDATE : deux instructions quel que soit le
+        nombre de lignes
+        """
+        plan = self._load_plan(df)
+        
+        def upsert(cursor) -> int:
+            self._fill_user_stage(cursor, df)
+            cursor.execute(plan['stage_merge'])
+            return cursor.rowcount
+        
+        return self._run_raw(upsert, connection)
+
+    def _stage_users_dataframe(self, df: pd.DataFrame, connection=None) -> int:
+        """
+        Charge le DataFrame nettoyé par la table temporaire user_stage et retourne le nombre de
+        lignes insérées
+        
+        Le COPY se fait dans une table sans index ni WAL ; User ne reçoit ensuite qu'un seul
+        INSERT ... SELECT, une ligne par email, les conflits (id ou email) étant écartés
+        """
+        plan = self._load_plan(df)
+        
+        def load(cursor) -> int:
+            self._fill_user_stage(cursor, df)
+            cursor.execute(plan['stage_load'])
+            return cursor.rowcount
+        
+        return self._run_raw(load, connection)
+
+    def _insert_users_skip_conflicts(self, df: pd.DataFrame, connection=None) -> List[str]:
+        """
+        Insère les utilisateurs du DataFrame nettoyé qui n'entrent en conflit avec aucune ligne
+        existante (id ou email) et retourne les ids insérés
+        
+        Même table temporaire que l'upsert, fusionnée par INSERT ... ON CONFLICT DO NOTHING : un
+        doublon n'annule plus tout le lot, seules les lignes écartées restent à traiter
+        """
+        plan = self._load_plan(df)
+        
+        def insert(cursor) -> List[str]:
+            self._fill_user_stage(cursor, df)
+            cursor.execute(plan['stage_insert'])
+            return [row[0] for row in cursor.fetchall()]
+        
+        return self._run_raw(insert, connection)
+
+    def _fill_user_stage(self, cursor, df: pd.DataFrame) -> None:
+        """
+        Copie (COPY) le DataFrame nettoyé dans la table temporaire user_stage, vidée au préalable
+        """
+        plan = self._load_plan(df)
+        _, buffer = self._users_copy_buffer(df)
+        
+        # Même structure que User, sans index ni contrainte d'unicité ; supprimée au COMMIT
+        cursor.execute("""
+            CREATE TEMP TABLE IF NOT EXISTS user_stage (LIKE public."User" INCLUDING DEFAULTS)
+            ON COMMIT DROP
+        """)
+        cursor.execute("TRUNCATE user_stage")
+        cursor.copy_expert(plan['stage_copy'], buffer)
+
+    def _insert_users_values(self, df: pd.DataFrame, connection=None) -> int:
+        """
+        Insère le DataFrame nettoyé en un seul INSERT ... VALUES multi-lignes (execute_values)
+        et retourne le nombre de lignes insérées
+        
+        Alternative à COPY : une analyse et un aller-retour par lot au lieu d'un par ligne
+        """
+        plan = self._load_plan(df)
+        columns = plan['columns']
+        
+        # NaN/NaT -> None : psycopg2 les transmet comme NULL
+        rows = self._rows_with_nulls(df, columns)
+        if not rows:
+            return 0
+        
+        def insert(cursor) -> int:
+            # Une seule page : rowcount couvre tout le lot
+            execute_values(cursor, plan['values'], rows, page_size=len(rows))
+            return cursor.rowcount
+        
+        return self._run_raw(insert, connection)
+
+    def _ingest_users_adbc(self, df: pd.DataFrame, connection=None) -> int:
+        """
+        Charge le DataFrame nettoyé via ADBC (adbc_ingest) et retourne le nombre de lignes insérées
+        
+        Les colonnes sont converties en une table Arrow typée, que le pilote envoie en COPY binaire
+        sans passer par Python cellule par cellule. Avec connection, revient au COPY psycopg2 dans
+        la transaction de l'appelant (ADBC ouvre sa propre connexion)
+        """
+        if connection is not None:
+            return self._copy_users_dataframe(df, connection)
+        if pa is None or adbc_postgresql is None:
+            raise RuntimeError("adbc-driver-postgresql is not installed (pip install adbc-driver-postgresql pyarrow)")
+        
+        columns = self._load_plan(df)['columns']
+        # Types explicites : une colonne entièrement vide n'est pas inférée en type null
+        schema = pa.schema([
+            pa.field(col, pa.bool_() if col in ('emailVerified', 'phoneVerified')
+                     else pa.timestamp('us') if col in ('createdAt', 'updatedAt', 'lastConnexion')
+                     else pa.string())
+            for col in columns
+        ])
+        table = pa.Table.from_pandas(df[columns], schema=schema, preserve_index=False)
+        
+        with adbc_postgresql.connect(self.connection_string) as conn:
+            with conn.cursor() as cursor:
+                inserted = cursor.adbc_ingest('User', table, mode='append', db_schema_name='public')
+            conn.commit()
+        return inserted if inserted >= 0 else len(df)
+
+    async def load_users_asyncpg(self, chunks: List[pd.DataFrame]) -> List[Any]:
+        """
+        Copie des lots bruts via asyncpg (copy_records_to_table, protocole COPY binaire :
+        ni échappement CSV ni analyse texte côté serveur)
+        
+        Chaque lot est nettoyé juste avant sa copie ; les lots partent en parallèle sur un pool de
+        load_concurrency connexions, chacun dans sa propre transaction. Retourne, pour chaque lot,
+        le nombre de lignes insérées ou l'exception qui l'a fait rejeter
+        """
+        if asyncpg is None:
+            raise RuntimeError("asyncpg is not installed (pip install asyncpg)")
+        
+        async with asyncpg.create_pool(self.connection_string, min_size=1,
+                                       max_size=max(1, self.load_concurrency),
+                                       command_timeout=60) as pool:
+            async def copy(chunk: pd.DataFrame) -> int:
+                columns, records = self._users_copy_records(self._clean_dataframe_for_postgres(chunk))
+                async with pool.acquire() as conn:
+                    # Statut de la forme 'COPY <n>'
+                    status = await conn.copy_records_to_table(
+                        'User', records=records, columns=columns, schema_name='public'
+                    )
+                return int(status.split()[-1])
+            
+            return await asyncio.gather(*(copy(chunk) for chunk in chunks), return_exceptions=True)
 
     def _prepare_dataframe_for_insertion(self, df: pd.DataFrame) -> pd.DataFrame:
         """
@@ -331,6 +865,40 @@ class PostgreSQLLoaderService:
         """
         return self._clean_dataframe_for_postgres(df)
 
+    def _format_interests_column(self, interests: pd.Series) -> np.ndarray:
+        """
+        Équivalent vectorisé de interests.map(self._format_array_for_postgres)
+        
+        Les listes de chaînes sont jointes puis échappées par les opérations .str de pandas (une
+        passe par colonne) ; le texte, les listes mixtes et les autres valeurs non nulles passent
+        par _format_array_for_postgres
+        """
+        formatted = np.full(len(interests), None, dtype=object)
+        present = interests.notna().to_numpy()
+        is_list = (interests.map(type) == list).to_numpy()
+        if not is_list.any():
+            formatted[present] = interests[present].map(self._format_array_for_postgres).to_numpy()
+            return formatted
+        
+        lists = interests[is_list]
+        sizes = lists.str.len()
+        # NaN si un élément n'est pas une chaîne ; séparateur présent dans un élément : non retenu
+        joined = lists.str.join(ARRAY_ITEM_SEPARATOR)
+        usable = (joined.notna() & (joined.str.count(ARRAY_ITEM_SEPARATOR) == sizes - 1)).to_numpy()
+        empty = (sizes == 0).to_numpy()
+        
+        positions = np.flatnonzero(is_list)
+        escaped = joined[usable].str.replace("'", "''", regex=False) \
+            .str.replace(ARRAY_ITEM_SEPARATOR, "','", regex=False)
+        formatted[positions[usable]] = ("{'" + escaped + "'}").to_numpy()
+        
+        # Listes vides : None, déjà en place
+        handled = np.zeros(len(interests), dtype=bool)
+        handled[positions[usable | empty]] = True
+        fallback = present & ~handled
+        formatted[fallback] = interests[fallback].map(self._format_array_for_postgres).to_numpy()
+        return formatted
+
     def _format_array_for_postgres(self, value) -> Optional[str]:
         """
         Formate les arrays pour PostgreSQL
@@ -358,7 +926,8 @@ class PostgreSQLLoaderService:
         Charge un seul utilisateur dans PostgreSQL
         """
         try:
-            self._insert_single_user(user_data)
+            # Dictionnaire fourni par l'appelant, non nettoyé : passage unique par _final_clean_value
+            self._insert_single_user({key: self._final_clean_value(value) for key, value in user_data.items()})
             print(f"✅ User {user_data.get('id', 'unknown')} inserted successfully")
             return True
         except Exception as e:
@@ -379,8 +948,11 @@ class PostgreSQLLoaderService:
                     for key, value in user_data.items():
                         if key != 'id':  # Don't update the ID
                             set_clauses.append(f'"{key}" = :{key}')
-                            # Clean the value
-                            if pd.isna(value):
+                            # Clean the value (listes : même format texte que le chargement en masse,
+                            # et pas de pd.isna, ambigu sur une liste)
+                            if isinstance(value, (list, np.ndarray)):
+                                clean_params[key] = self._format_array_for_postgres(list(value))
+                            elif pd.isna(value):
                                 clean_params[key] = None
                             elif hasattr(value, 'to_pydatetime'):
                                 clean_params[key] = value.to_pydatetime()
@@ -409,8 +981,7 @@ class PostgreSQLLoaderService:
         try:
             with self.engine.connect() as conn:
                 with conn.begin():
-                    query = text('DELETE FROM public."User" WHERE id = :user_id')
-                    result = conn.execute(query, {'user_id': user_id})
+                    result = conn.execute(DELETE_USER_QUERY, {'user_id': user_id})
                     
                     if result.rowcount > 0:
                         print(f"✅ User {user_id} deleted successfully")
@@ -429,33 +1000,23 @@ class PostgreSQLLoaderService:
         """
         try:
             with self.engine.connect() as conn:
-                # Total users
-                total_query = text('SELECT COUNT(*) FROM public."User"')
-                total_users = conn.execute(total_query).fetchone()[0]
+                rows = conn.execute(USER_STATS_QUERY).fetchall()
                 
-                # Users by provider
-                provider_query = text('''
-                    SELECT provider, COUNT(*) 
-                    FROM public."User" 
-                    GROUP BY provider
-                ''')
-                provider_stats = dict(conn.execute(provider_query).fetchall())
-                
-                # Users with email verification
-                verified_query = text('''
-                    SELECT "emailVerified", COUNT(*) 
-                    FROM public."User" 
-                    GROUP BY "emailVerified"
-                ''')
-                verified_stats = dict(conn.execute(verified_query).fetchall())
-                
-                # Recent users (last 30 days)
-                recent_query = text('''
-                    SELECT COUNT(*) 
-                    FROM public."User" 
-                    WHERE "createdAt" >= NOW() - INTERVAL '30 days'
-                ''')
-                recent_users = conn.execute(recent_query).fetchone()[0]
+                total_users = 0
+                recent_users = 0
+                provider_stats = {}
+                verified_stats = {}
+                for grouping, provider, email_verified, count, recent_count in rows:
+                    if grouping == 1:
+                        # Users by provider
+                        provider_stats[provider] = count
+                    elif grouping == 2:
+                        # Users with email verification
+                        verified_stats[email_verified] = count
+                    else:
+                        # Total users, recent users (last 30 days)
+                        total_users = count
+                        recent_users = recent_count
                 
                 stats = {
                     'total_users': total_users,
@@ -476,13 +1037,16 @@ class PostgreSQLLoaderService:
         Nettoie les doublons dans la base de données
         """
         try:
+            # Nom de colonne échappé par le dialecte (guillemets doublés), pas interpolé tel quel
+            column_sql = self.engine.dialect.identifier_preparer.quote_identifier(column)
+            
             with self.engine.connect() as conn:
                 with conn.begin():
                     # Find duplicates
                     duplicate_query = text(f'''
-                        SELECT "{column}", COUNT(*) 
+                        SELECT {column_sql}, COUNT(*) 
                         FROM public."User" 
-                        GROUP BY "{column}" 
+                        GROUP BY {column_sql} 
                         HAVING COUNT(*) > 1
                     ''')
                     
@@ -494,20 +1058,20 @@ class PostgreSQLLoaderService:
                     
                     print(f"⚠️  Found {len(duplicates)} duplicate {column} values")
                     
+                    # Keep the newest record, delete the rest (même requête pour chaque valeur)
+                    delete_query = text(f'''
+                        DELETE FROM public."User" 
+                        WHERE {column_sql} = :value 
+                        AND id NOT IN (
+                            SELECT id FROM public."User" 
+                            WHERE {column_sql} = :value 
+                            ORDER BY "createdAt" DESC 
+                            LIMIT 1
+                        )
+                    ''')
+                    
                     removed_count = 0
                     for duplicate_value, count in duplicates:
-                        # Keep the newest record, delete the rest
-                        delete_query = text(f'''
-                            DELETE FROM public."User" 
-                            WHERE "{column}" = :value 
-                            AND id NOT IN (
-                                SELECT id FROM public."User" 
-                                WHERE "{column}" = :value 
-                                ORDER BY "createdAt" DESC 
-                                LIMIT 1
-                            )
-                        ''')
-                        
                         result = conn.execute(delete_query, {'value': duplicate_value})
                         removed_count += result.rowcount
                         print(f"🧹 Removed {result.rowcount} duplicate records for {column}: {duplicate_value}")
@@ -521,10 +1085,52 @@ class PostgreSQLLoaderService:
             print(f"❌ Error cleaning duplicates: {e}")
             return {'error': str(e)}
 
-    def load_users_dataframe(self, df: pd.DataFrame) -> Dict[str, Any]:
+    def load_users_dataframe(self, df: pd.DataFrame, method: str = 'copy',
+                             chunk_size: Optional[int] = None, connection=None) -> Dict[str, Any]:
         """
         Charge un DataFrame d'utilisateurs dans PostgreSQL avec gestion d'erreurs
+        
+        method :
+        - 'copy' : COPY FROM STDIN par lots de chunk_size lignes (défaut LOAD_CHUNK_SIZE ou
+          _auto_chunk_size). Un lot rejeté est réinséré via une table temporaire en écartant les
+          conflits, sinon par sous-lots execute_values ; seules les lignes écartées repassent
+          ligne par ligne
+        - 'upsert' : comme 'copy', mais chaque lot passe par une table temporaire et met à jour
+          les ids existants (reprises par sous-lots puis par ligne, toujours en upsert)
+        - 'stage' : COPY dans la table temporaire puis un INSERT ... SELECT par lot, doublons et
+          conflits écartés
+        - 'values' : un INSERT multi-lignes par lot
+        - 'asyncpg' : COPY binaire via load_users_asyncpg
+        - 'adbc' : table Arrow ingérée par ADBC
+        - 'rows' : insertions individuelles uniquement
+        
+        connection : Connection SQLAlchemy ouverte par engine.begin(). Tout le chargement se fait
+        alors dans la transaction de l'appelant (lots et lignes dans des SAVEPOINT, COPY séquentiels ;
+        'asyncpg' et 'adbc' y reviennent au COPY psycopg2, faute de pouvoir partager la transaction)
+        
+        Une méthode inconnue (ex: LOAD_METHOD mal orthographié) lève ValueError ; 'asyncpg' sans
+        connection lève RuntimeError dans une boucle d'événements active
         """
+        chunk_loaders = {
+            'copy': self._copy_users_dataframe,
+            'upsert': self._upsert_users_dataframe,
+            'stage': self._stage_users_dataframe,
+            'values': self._insert_users_values,
+            'asyncpg': self._copy_users_dataframe,
+            'adbc': self._ingest_users_adbc
+        }
+        if method != 'rows' and method not in chunk_loaders:
+            raise ValueError(f"Unknown load method: {method}")
+        if method == 'asyncpg' and connection is None:
+            # asyncio.run échoue dans une boucle d'événements déjà active
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                pass
+            else:
+                raise RuntimeError("method='asyncpg' cannot run inside a running event loop; "
+                                   "await load_users_asyncpg() or use method='copy'")
+        
         try:
             print(f"🔄 Starting to load {len(df)} users to PostgreSQL...")
             
@@ -543,52 +1149,200 @@ class PostgreSQLLoaderService:
                         'errors': []
                     }
             
-            # Clean dataframe for PostgreSQL
-            df_clean = self._clean_dataframe_for_postgres(df)
-            
             # Track statistics
-            total_processed = len(df_clean)
+            total_processed = len(df)
             inserted_count = 0
             failed_count = 0
             errors = []
             
-            print("📝 Inserting users individually to handle errors gracefully...")
+            # Chargement en masse : un COPY FROM STDIN (et une transaction) par lot de chunk_size lignes,
+            # jusqu'à load_concurrency lots en parallèle sur des connexions distinctes
+            if method == 'rows':
+                rows_df = self._clean_dataframe_for_postgres(df)
+            else:
+                chunk_size = chunk_size or self.load_chunk_size or self._auto_chunk_size(df, method)
+                starts = range(0, total_processed, chunk_size)
+                # Tranches du DataFrame brut : chaque lot est nettoyé juste avant son envoi, jamais
+                # tout le DataFrame nettoyé en mémoire à la fois
+                chunks = [df.iloc[start:start + chunk_size] for start in starts]
+                # 'asyncpg' ne passe par load_chunk qu'avec connection : COPY psycopg2 dans la transaction
+                load_chunk = chunk_loaders[method]
+                
+                def clean_and_load(chunk: pd.DataFrame, chunk_connection=None) -> int:
+                    return load_chunk(self._clean_dataframe_for_postgres(chunk), chunk_connection)
+                
+                rejected_chunks = []
+                if connection is not None:
+                    # Une seule connexion : lots l'un après l'autre, chacun dans un SAVEPOINT
+                    for start, chunk in zip(starts, chunks):
+                        savepoint = connection.begin_nested()
+                        try:
+                            inserted_count += clean_and_load(chunk, connection)
+                            savepoint.commit()
+                        except Exception as e:
+                            savepoint.rollback()
+                            logger.warning("Bulk load of rows %d-%d failed, retrying without conflicting rows: %s",
+                                           start, start + len(chunk) - 1, e)
+                            rejected_chunks.append(chunk)
+                elif method == 'asyncpg':
+                    results = asyncio.run(self.load_users_asyncpg(chunks))
+                    for start, chunk, result in zip(starts, chunks, results):
+                        if isinstance(result, Exception):
+                            logger.warning("Bulk load of rows %d-%d failed, retrying without conflicting rows: %s",
+                                           start, start + len(chunk) - 1, result)
+                            rejected_chunks.append(chunk)
+                        else:
+                            inserted_count += result
+                else:
+                    with ThreadPoolExecutor(max_workers=max(1, min(self.load_concurrency, len(chunks)))) as executor:
+                        futures = [executor.submit(clean_and_load, chunk) for chunk in chunks]
+                        for start, chunk, future in zip(starts, chunks, futures):
+                            try:
+                                inserted_count += future.result()
+                            except Exception as e:
+                                # COPY est tout-ou-rien : un lot rejeté (doublon, contrainte...) est repris plus bas
+                                logger.warning("Bulk load of rows %d-%d failed, retrying without conflicting rows: %s",
+                                               start, start + len(chunk) - 1, e)
+                                rejected_chunks.append(chunk)
+                print(f"✅ Bulk loaded {inserted_count} users ({method})")
+                
+                # Lots rejetés (doublon, contrainte...) : nouvel essai via la table temporaire en écartant
+                # les conflits ; seules les lignes écartées, ou les lots qui échouent encore, passent
+                # ligne par ligne. En upsert, les reprises mettent aussi à jour les ids existants
+                def attempt(load: Callable[..., Any], chunk_clean: pd.DataFrame) -> Any:
+                    # Résultat de load, ou l'exception (SAVEPOINT annulé dans la transaction de l'appelant)
+                    savepoint = connection.begin_nested() if connection is not None else None
+                    try:
+                        result = load(chunk_clean, connection)
+                    except Exception as e:
+                        if savepoint is not None:
+                            savepoint.rollback()
+                        return e
+                    if savepoint is not None:
+                        savepoint.commit()
+                    return result
+                
+                leftover_chunks = []
+                for chunk in rejected_chunks:
+                    chunk_clean = self._clean_dataframe_for_postgres(chunk)
+                    if method == 'upsert':
+                        # Pas de reprise insert-only : la fusion par id (stage_merge) est rejouée par
+                        # sous-lots, pour ne pas perdre les mises à jour du lot
+                        load_batch = self._upsert_users_dataframe
+                    else:
+                        result = attempt(self._insert_users_skip_conflicts, chunk_clean)
+                        if not isinstance(result, Exception):
+                            inserted_count += len(result)
+                            inserted = chunk_clean['id'].isin(result)
+                            # Un id inséré ne l'est qu'une fois : ses autres lignes du lot ont été
+                            # écartées par ON CONFLICT et comptent comme échecs
+                            for user_id in chunk_clean.loc[inserted & chunk_clean['id'].duplicated(), 'id']:
+                                failed_count += 1
+                                errors.append({'user_id': user_id, 'error': 'Duplicate id in batch, row skipped'})
+                            leftover_chunks.append(chunk_clean[~inserted])
+                            continue
+                        
+                        logger.warning("Staged insert of %d rejected rows failed, retrying in batches of %d: %s",
+                                       len(chunk_clean), FALLBACK_BATCH_SIZE, result)
+                        load_batch = self._insert_users_values
+                    # Sous-lots (INSERT multi-lignes execute_values, ou fusion par id en upsert) : une
+                    # ligne invalide n'envoie plus que son sous-lot ligne par ligne
+                    for start in range(0, len(chunk_clean), FALLBACK_BATCH_SIZE):
+                        batch = chunk_clean.iloc[start:start + FALLBACK_BATCH_SIZE]
+                        result = attempt(load_batch, batch)
+                        if isinstance(result, Exception):
+                            leftover_chunks.append(batch)
+                        else:
+                            inserted_count += result
+                rows_df = pd.concat(leftover_chunks) if leftover_chunks else df.iloc[:0]
+            
+            if not rows_df.empty:
+                print("📝 Inserting users individually to handle errors gracefully...")
+                # En upsert, dernier recours ligne par ligne par INSERT ... ON CONFLICT (id) DO UPDATE
+                upsert = method == 'upsert'
             
-            # Insert users one by one to handle errors gracefully
-            for idx, row in df_clean.iterrows():
+                def insert_row(user_data: Dict[str, Any], row_connection) -> Optional[Exception]:
+                    try:
+                        self._insert_single_user(user_data, row_connection, upsert)
+                        return None
+                    except Exception as e:
+                        return e
+                
+                def insert_rows(batch: List[Dict[str, Any]], batch_connection) -> List[Optional[Exception]]:
+                    # Lignes regroupées par colonnes renseignées : une requête (execute_batch) par groupe ;
+                    # un groupe rejeté repasse ligne par ligne, chacune dans son SAVEPOINT
+                    groups: Dict[Tuple[str, ...], List[int]] = {}
+                    rows = []
+                    for position, user_data in enumerate(batch):
+                        columns, values = self._user_insert_values(user_data)
+                        groups.setdefault(columns, []).append(position)
+                        rows.append(values)
+                    
+                    outcomes: List[Optional[Exception]] = [None] * len(batch)
+                    for columns, positions in groups.items():
+                        if columns:
+                            try:
+                                self._insert_users_group(columns, [rows[p] for p in positions], batch_connection,
+                                                         upsert)
+                                continue
+                            except Exception as e:
+                                logger.debug("Grouped insert of %d users failed, inserting one by one: %s",
+                                             len(positions), e)
+                        for p in positions:
+                            outcomes[p] = insert_row(batch[p], batch_connection)
+                    return outcomes
+                
+                def insert_slice(batch: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+                    # Une connexion (et une transaction) pour toute la tranche
+                    with self.engine.begin() as batch_connection:
+                        return insert_rows(batch, batch_connection)
+                
+                # NaN/NaT -> None en une passe sur le lot (colonnes avec valeurs manquantes seulement) :
+                # _insert_single_user n'a plus qu'à écarter les None
+                columns = list(rows_df.columns)
+                records = [dict(zip(columns, row)) for row in self._rows_with_nulls(rows_df, columns)]
+                # Sans connexion imposée : load_concurrency tranches en parallèle, chacune sur une seule
+                # connexion empruntée au pool ; sinon SAVEPOINT successifs sur la connexion de l'appelant
+                executor = ThreadPoolExecutor(max_workers=max(1, self.load_concurrency)) if connection is None else None
                 try:
-                    user_data = row.to_dict()
-                    self._insert_single_user(user_data)
-                    inserted_count += 1
+                    if executor:
+                        slice_size = -(-len(records) // max(1, self.load_concurrency))
+                        slices = [records[start:start + slice_size] for start in range(0, len(records), slice_size)]
+                        outcomes = (error for batch_errors in executor.map(insert_slice, slices) for error in batch_errors)
+                    else:
+                        outcomes = insert_rows(records, connection)
                     
-                    # Progress indicator
-                    if (idx + 1) % 100 == 0 or (idx + 1) == len(df_clean):
-                        print(f"📝 Processed {idx + 1}/{len(df_clean)} users... (Success: {inserted_count}, Failed: {failed_count})")
+                    # Insert users one by one to handle errors gracefully
+                    for position, (user_data, error) in enumerate(zip(records, outcomes), start=1):
+                        if error is None:
+                            inserted_count += 1
+                        else:
+                            failed_count += 1
+                            error_info = {
+                                'user_id': user_data.get('id', 'unknown'),
+                                'error': str(error)
+                            }
+                            errors.append(error_info)
+                            logger.debug("Failed to insert user %s: %s", user_data.get('id', 'unknown'), error)
                         
-                except Exception as e:
-                    failed_count += 1
-                    error_info = {
-                        'user_id': user_data.get('id', 'unknown'),
-                        'error': str(e)
-                    }
-                    errors.append(error_info)
-                    print(f"❌ Failed to insert user {user_data.get('id', 'unknown')}: {e}")
+                        # Progress indicator
+                        if (position % 100 == 0 or position == len(records)) and logger.isEnabledFor(logging.INFO):
+                            logger.info("Processed %d/%d users... (Success: %d, Failed: %d)",
+                                        position, len(records), inserted_count, failed_count)
+                finally:
+                    if executor:
+                        executor.shutdown()
             
             print("✅ Loading completed!")
             
-            # Get updated database stats
-            try:
-                stats = self.get_user_stats()
-            except:
-                stats = {'total_users': 0, 'provider_distribution': {}}
-            
+            # inserted_count vient du rowcount de COPY / des insertions : pas de COUNT(*) après chaque
+            # chargement, les statistiques de la table restent à la demande (get_user_stats)
             return {
                 'success': True,
                 'total_processed': total_processed,
                 'inserted_count': inserted_count,
                 'failed_count': failed_count,
-                'errors': errors,
-                'database_stats': stats
+                'errors': errors
             }
             
         except Exception as e:
@@ -604,6 +1358,44 @@ class PostgreSQLLoaderService:
                 'errors': []
             }
 
+    def load_users_batches(self, batches: Iterable[pd.DataFrame], method: str = 'copy') -> Dict[str, Any]:
+        """
+        Charge des lots successifs de DataFrames (ex: DatastoreUserService.iter_users_batches)
+
+        Chaque lot passe par load_users_dataframe (COPY puis repli ligne par ligne) ;
+        un seul lot est en mémoire à la fois
+        """
+        totals = {
+            'success': True,
+            'batch_count': 0,
+            'total_processed': 0,
+            'inserted_count': 0,
+            'failed_count': 0,
+            'errors': [],
+            'database_stats': {}
+        }
+
+        for batch_df in batches:
+            totals['batch_count'] += 1
+            result = self.load_users_dataframe(batch_df, method=method)
+
+            totals['total_processed'] += result['total_processed']
+            totals['inserted_count'] += result['inserted_count']
+            totals['failed_count'] += result['failed_count']
+            totals['errors'].extend(result['errors'])
+
+            if not result['success']:
+                print(f"❌ Batch {totals['batch_count']} failed, stopping: {result.get('error')}")
+                totals['success'] = False
+                totals['error'] = result.get('error')
+                break
+
+            print(f"📦 Batch {totals['batch_count']} loaded ({totals['inserted_count']} users so far)")
+
+        # Statistiques de la table une seule fois, après le dernier lot
+        totals['database_stats'] = self.get_user_stats()
+        return totals
+
     def load_users_list(self, users_list: List[Dict[str, Any]]) -> Dict[str, Any]:
         """
         Charge une liste d'utilisateurs dans PostgreSQL
@@ -619,18 +1411,13 @@ class PostgreSQLLoaderService:
         try:
             with self.engine.connect() as conn:
                 # Check if table exists
-                result = conn.execute(text("""
-                    SELECT EXISTS (
-                        SELECT FROM information_schema.tables 
-                        WHERE table_schema = 'public' 
-                        AND table_name = 'User'
-                    );
-                """))
+                result = conn.execute(TABLE_EXISTS_QUERY, {'schema': 'public', 'table': 'User'})
                 
                 table_exists = result.scalar()
                 
                 if table_exists:
                     print("✅ Table 'User' exists")
+                    self._table_exists = True
                     return True
                 else:
                     print("⚠️  Table 'User' does not exist, creating it...")
@@ -671,6 +1458,7 @@ class PostgreSQLLoaderService:
                     """))
                     
             print("✅ Table 'User' created successfully")
+            self._table_exists = True
             return True
             
         except Exception as e:
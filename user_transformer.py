@@ -5,6 +5,11 @@ from pydantic import BaseModel, ValidationError
 from enum import Enum
 import numpy as np
 import uuid
+import logging
+from operator import attrgetter
+
+# Diagnostics par utilisateur via ce logger (DEBUG) plutôt que print dans les boucles
+logger = logging.getLogger(__name__)
 
 class UserStatus(str, Enum):
     ACTIVE = "ACTIVE"
@@ -31,6 +36,37 @@ class UserModel(BaseModel):
     interests: Optional[List[str]] = None
     lastConnexion: Optional[datetime] = None
 
+# Colonnes du DataFrame transformé, dans l'ordre du modèle
+USER_COLUMNS = tuple(UserModel.model_fields)
+# Ligne du DataFrame transformé lue sur un UserModel en un appel (tuple dans l'ordre de USER_COLUMNS)
+USER_ROW_GETTER = attrgetter(*USER_COLUMNS)
+
+# Types inférés par pd.api.types.infer_dtype pour des colonnes sans listes ni tableaux :
+# leurs valeurs manquantes se nettoient en une opération sur la colonne
+SCALAR_INFERRED_TYPES = frozenset({
+    'empty', 'string', 'bytes', 'boolean', 'integer', 'floating', 'mixed-integer-float',
+    'decimal', 'datetime64', 'datetime', 'date', 'time', 'timedelta64', 'timedelta', 'period'
+})
+
+# Types explicites appliqués une fois au DataFrame transformé (pas de ré-inférence en aval)
+USER_BOOL_COLUMNS = ('emailVerified', 'phoneVerified')
+USER_DATETIME_COLUMNS = ('birthdate', 'createdAt', 'updatedAt', 'lastConnexion')
+
+# Colonnes brutes lues par _parse_datetime dans transform_single_user
+RAW_DATETIME_COLUMNS = (
+    'birthDate', 'birth_date', 'createdAt', 'created_at',
+    'updatedAt', 'updated_at', 'lastConnexion', 'last_connexion'
+)
+
+# Formats texte essayés par _parse_datetime, dans l'ordre
+DATETIME_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S',
+    '%Y-%m-%dT%H:%M:%S.%f',
+    '%Y-%m-%dT%H:%M:%SZ',
+    '%Y-%m-%d'
+)
+
 class UserTransformerService:
     """
     Service pour transformer les données brutes de Firebase vers le modèle UserModel
@@ -80,6 +116,52 @@ class UserTransformerService:
                 return None
         return value
     
+    def _clean_nan_column(self, series: pd.Series) -> pd.Series:
+        """
+        Équivalent de series.apply(self._clean_nan_values), vectorisé quand la colonne ne
+        contient que des scalaires ; seules les colonnes mixtes (listes possibles) sont
+        nettoyées cellule par cellule
+        """
+        if series.dtype != object or pd.api.types.infer_dtype(series, skipna=True) in SCALAR_INFERRED_TYPES:
+            missing = series.isna()
+            if not missing.any():
+                return series
+            return series.astype(object).where(~missing, None)
+        return series.apply(self._clean_nan_values)
+    
+    def _preparse_datetime_columns(self, columns: Dict[str, pd.Series]) -> None:
+        """
+        Convertit d'avance en datetime les dates texte des colonnes brutes (modifie columns)
+        
+        Les cellules de toutes les colonnes de dates sont analysées ensemble, un appel
+        pd.to_datetime par format de DATETIME_FORMATS ; celles qu'aucun format ne reconnaît
+        (ou hors plage datetime64) restent telles quelles pour _parse_datetime
+        """
+        names = [col for col in RAW_DATETIME_COLUMNS if col in columns]
+        if not names:
+            return
+        
+        row_count = len(columns[names[0]])
+        flat = np.concatenate([columns[col].to_numpy(dtype=object) for col in names])
+        is_text = np.fromiter((isinstance(value, str) for value in flat), dtype=bool, count=len(flat))
+        if not is_text.any():
+            return
+        
+        texts = pd.Series(flat[is_text])
+        parsed = pd.Series(pd.NaT, index=texts.index, dtype='datetime64[ns]')
+        for fmt in DATETIME_FORMATS:
+            pending = parsed.isna()
+            if not pending.any():
+                break
+            parsed[pending] = pd.to_datetime(texts[pending], format=fmt, errors='coerce')
+        
+        recognized = parsed.notna().to_numpy()
+        flat[np.flatnonzero(is_text)[recognized]] = pd.DatetimeIndex(parsed[recognized]).to_pydatetime()
+        
+        for position, col in enumerate(names):
+            start = position * row_count
+            columns[col] = pd.Series(flat[start:start + row_count], index=columns[col].index, name=col)
+    
     def _parse_datetime(self, value: Any) -> Optional[datetime]:
         """
         Parse différents formats de datetime avec gestion robuste des NaT
@@ -106,14 +188,7 @@ class UserTransformerService:
                 
             try:
                 # Try different datetime formats
-                formats = [
-                    '%Y-%m-%d %H:%M:%S',
-                    '%Y-%m-%dT%H:%M:%S',
-                    '%Y-%m-%dT%H:%M:%S.%f',
-                    '%Y-%m-%dT%H:%M:%SZ',
-                    '%Y-%m-%d'
-                ]
-                for fmt in formats:
+                for fmt in DATETIME_FORMATS:
                     try:
                         return datetime.strptime(value, fmt)
                     except ValueError:
@@ -263,9 +338,8 @@ class UserTransformerService:
                     'count': duplicate_count,
                     'ids': dupes['id'].tolist() if 'id' in dupes.columns else []
                 }
-                print(f"  - {value}: {duplicate_count} records")
-                if 'id' in dupes.columns:
-                    print(f"    IDs: {dupes['id'].tolist()}")
+                logger.debug("  - %s: %d records, IDs: %s", value, duplicate_count,
+                             duplicate_stats[value]['ids'])
             
             self.deduplication_stats = {
                 'duplicates_found': len(duplicates),
@@ -279,15 +353,14 @@ class UserTransformerService:
                 # Try to sort by the specified column
                 if sort_column in df.columns:
                     print(f"Sorting by '{sort_column}' column...")
-                    df_copy = df.copy()
-                    df_copy['_sort_parsed'] = df_copy[sort_column].apply(self._parse_datetime)
+                    # Clé de tri calculée à part : pas de copie du DataFrame pour une colonne temporaire
+                    sort_parsed = df[sort_column].apply(self._parse_datetime)
                     
-                    valid_dates = df_copy['_sort_parsed'].notna().sum()
-                    print(f"Successfully parsed {valid_dates} out of {len(df_copy)} dates")
+                    valid_dates = sort_parsed.notna().sum()
+                    print(f"Successfully parsed {valid_dates} out of {len(df)} dates")
                     
-                    df_copy = df_copy.sort_values('_sort_parsed', na_position='first')
-                    df_deduplicated = df_copy.drop_duplicates([duplicate_column], keep=keep)
-                    df_deduplicated = df_deduplicated.drop('_sort_parsed', axis=1)
+                    sorted_index = sort_parsed.sort_values(na_position='first').index
+                    df_deduplicated = df.loc[sorted_index].drop_duplicates([duplicate_column], keep=keep)
                 else:
                     print(f"Column '{sort_column}' not found, using original order")
                     df_deduplicated = df.drop_duplicates([duplicate_column], keep=keep)
@@ -349,7 +422,7 @@ class UserTransformerService:
             # Special handling for users without email (Google provider)
             if not transformed_data['email'] and raw_user.get('provider') == 'google.com':
                 transformed_data['email'] = f"google_user_{raw_user.get('uid', 'unknown')}@placeholder.com"
-                print(f"⚠️  Generated placeholder email for Google user: {transformed_data['email']}")
+                logger.debug("Generated placeholder email for Google user: %s", transformed_data['email'])
             
             # Ensure required fields have values
             if not transformed_data['id']:
@@ -375,7 +448,7 @@ class UserTransformerService:
                 'raw_data_keys': list(raw_user.keys())
             }
             self.transformation_errors.append(error_info)
-            print(f"❌ Validation error for user {error_info['user_id']}: {str(e)}")
+            logger.debug("Validation error for user %s: %s", error_info['user_id'], e)
             return None
             
         except Exception as e:
@@ -388,7 +461,7 @@ class UserTransformerService:
                 'raw_data_keys': list(raw_user.keys())
             }
             self.transformation_errors.append(error_info)
-            print(f"❌ Transformation error for user {error_info['user_id']}: {str(e)}")
+            logger.debug("Transformation error for user %s: %s", error_info['user_id'], e)
             return None
     
     def transform_users_dataframe(self, df: pd.DataFrame, remove_duplicates: bool = True) -> pd.DataFrame:
@@ -401,17 +474,23 @@ class UserTransformerService:
         
         # Step 1: Clean DataFrame - replace NaN with None de manière sécurisée
         print("🧹 Cleaning NaN values...")
-        df_cleaned = df.copy()
+        # Chaque colonne est remplacée : nouveau DataFrame construit colonne par colonne,
+        # sans copie préalable du DataFrame d'entrée (qui n'est pas modifié)
+        cleaned_columns = {}
         
         # Nettoyage colonne par colonne pour éviter les erreurs d'ambiguïté
-        for col in df_cleaned.columns:
+        for col in df.columns:
             try:
-                # Appliquer le nettoyage sur chaque cellule individuellement
-                df_cleaned[col] = df_cleaned[col].apply(lambda x: self._clean_nan_values(x))
+                cleaned_columns[col] = self._clean_nan_column(df[col])
             except Exception as e:
                 print(f"⚠️  Warning: Could not clean column {col}: {e}")
                 # En cas d'erreur, essayer un nettoyage basique
-                df_cleaned[col] = df_cleaned[col].where(pd.notna(df_cleaned[col]), None)
+                cleaned_columns[col] = df[col].where(pd.notna(df[col]), None)
+        
+        # Dates texte converties en une passe vectorisée avant la déduplication et la transformation
+        self._preparse_datetime_columns(cleaned_columns)
+        
+        df_cleaned = pd.DataFrame(cleaned_columns, index=df.index, copy=False)
         
         # Step 2: Remove duplicates if requested
         if remove_duplicates:
@@ -422,19 +501,32 @@ class UserTransformerService:
         print(f"\n=== Transforming users to UserModel ===")
         transformed_users = []
         
-        for idx, row in df_cleaned.iterrows():
-            raw_user = row.to_dict()
+        total_users = len(df_cleaned)
+        
+        # Un seul to_dict('records') au lieu d'une Series puis d'un dict par ligne
+        for position, raw_user in enumerate(df_cleaned.to_dict('records'), start=1):
             user_model = self.transform_single_user(raw_user)
             
             if user_model:
-                user_dict = user_model.dict()
-                transformed_users.append(user_dict)
+                # Tuple des attributs plutôt qu'un dict par utilisateur (model.dict(), dépréciée)
+                transformed_users.append(USER_ROW_GETTER(user_model))
             
             # Progress indicator
-            if (idx + 1) % 100 == 0 or (idx + 1) == len(df_cleaned):
-                print(f"📝 Processed {idx + 1}/{len(df_cleaned)} users... (Success: {self.successful_transformations}, Failed: {self.failed_transformations})")
+            if (position % 100 == 0 or position == total_users) and logger.isEnabledFor(logging.INFO):
+                logger.info("Processed %d/%d users... (Success: %d, Failed: %d)", position, total_users,
+                            self.successful_transformations, self.failed_transformations)
+        
+        # Schéma connu d'avance : pas de parcours de toutes les lignes pour découvrir les clés
+        result_df = pd.DataFrame.from_records(transformed_users, columns=USER_COLUMNS)
         
-        result_df = pd.DataFrame(transformed_users)
+        # Colonnes typées une fois pour toutes : booléens et datetime64 au lieu d'objets Python
+        result_df = result_df.astype({col: bool for col in USER_BOOL_COLUMNS})
+        for col in USER_DATETIME_COLUMNS:
+            try:
+                result_df[col] = pd.to_datetime(result_df[col])
+            except (ValueError, TypeError):
+                # Fuseaux horaires mélangés ou date hors plage datetime64 : la colonne reste en objets
+                pass
         
         print(f"✅ Transformation completed: {len(result_df)} users successfully transformed")
         
@@ -476,12 +568,23 @@ class UserTransformerService:
             'deduplication_stats': self.deduplication_stats
         }
     
-    def export_transformed_users(self, users_df: pd.DataFrame, filename: str = 'transformed_users.csv') -> bool:
+    def export_transformed_users(self, users_df: pd.DataFrame, filename: str = 'transformed_users.csv',
+                                 append: bool = False) -> bool:
         """
-        Exporte les utilisateurs transformés vers un fichier CSV
+        Exporte les utilisateurs transformés vers un fichier Parquet (extension .parquet,
+        compression snappy) ou CSV
+        
+        Avec append=True (CSV uniquement), les lignes sont ajoutées à la fin du fichier sans
+        ré-écrire l'en-tête (export page par page)
         """
         try:
-            users_df.to_csv(filename, index=False, encoding='utf-8')
+            if filename.endswith('.parquet'):
+                if append:
+                    raise ValueError("append is not supported for Parquet exports, write one file per page")
+                users_df.to_parquet(filename, engine='pyarrow', compression='snappy', index=False)
+            else:
+                users_df.to_csv(filename, mode='a' if append else 'w', header=not append,
+                                index=False, encoding='utf-8')
             print(f"✅ Transformed users exported to: {filename}")
             return True
         except Exception as e: